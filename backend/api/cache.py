@@ -0,0 +1,207 @@
+import hashlib
+import time
+import uuid
+from array import array
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from foodgram.constants import (RECIPE_FRAGMENT_CACHE_TIMEOUT,
+                                RECIPE_LIST_CACHE_FRESH,
+                                RECIPE_LIST_CACHE_LOCK_TIMEOUT,
+                                RECIPE_LIST_CACHE_TIMEOUT,
+                                USER_RELATIONS_CACHE_TIMEOUT)
+
+RECIPE_LIST_GENERATION_KEY = 'recipes:list:generation'
+
+
+def is_shared_cache(alias=DEFAULT_CACHE_ALIAS):
+    """
+    Метод проверяет, что кэш общий для всех процессов приложения.
+
+    Кэш в памяти процесса не годится для блокировок, счётчиков
+    и данных, которые сбрасываются из других процессов.
+    """
+
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def get_generation(key):
+    """
+    Метод возвращает значение поколения по ключу, создавая его при
+    отсутствии; при гонке используется значение, записанное первым.
+    """
+
+    generation = cache.get(key)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        if not cache.add(key, generation, None):
+            generation = cache.get(key, generation)
+    return generation
+
+
+def get_recipe_list_generation():
+    """
+    Метод возвращает текущее поколение кэша списка рецептов.
+    """
+
+    return get_generation(RECIPE_LIST_GENERATION_KEY)
+
+
+def bump_recipe_list_generation():
+    """
+    Метод помечает все закэшированные страницы списка рецептов устаревшими.
+
+    Вместо инкремента используется случайное значение, поэтому
+    конкурентные изменения не могут вернуть счётчик к прежнему значению.
+    """
+
+    cache.set(RECIPE_LIST_GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def get_user_relations_key(user_id):
+    """
+    Метод возвращает ключ поколения связей пользователя с рецептами.
+    """
+
+    return f'users:{user_id}:relations:generation'
+
+
+def get_user_relations_generation(user_id):
+    """
+    Метод возвращает поколение связей пользователя: избранного,
+    корзины и подписок.
+    """
+
+    return get_generation(get_user_relations_key(user_id))
+
+
+def bump_user_relations_generation(user_id):
+    """
+    Метод помечает закэшированные данные, зависящие от связей
+    пользователя, устаревшими.
+    """
+
+    cache.set(get_user_relations_key(user_id), uuid.uuid4().hex, None)
+
+
+def get_user_relation_ids(user_id, name, build):
+    """
+    Метод возвращает множество идентификаторов связи пользователя.
+
+    В кэше множество хранится компактным массивом 64-битных чисел
+    под ключом с поколением связей пользователя. Поколение сбрасывается
+    в процессе, изменившем связи, поэтому с кэшем в памяти процесса
+    множество строится заново для каждого запроса.
+    """
+
+    if not is_shared_cache():
+        return frozenset(build())
+    generation = get_user_relations_generation(user_id)
+    key = f'users:{user_id}:relations:{name}:{generation}'
+    ids = cache.get(key)
+    if ids is None:
+        ids = array('q', sorted(build()))
+        cache.set(key, ids, USER_RELATIONS_CACHE_TIMEOUT)
+    return frozenset(ids)
+
+
+def get_recipe_list_cache_key(request):
+    """
+    Метод формирует ключ кэша по хосту и нормализованной строке запроса.
+    """
+
+    query = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    )
+    signature = repr((request.get_host(), request.path, query))
+    digest = hashlib.md5(signature.encode()).hexdigest()
+    return f'recipes:list:{digest}'
+
+
+def get_or_build_recipe_list(request, build):
+    """
+    Метод возвращает данные страницы списка рецептов из кэша.
+
+    Устаревшая запись (истёк срок свежести или сменилось поколение)
+    пересобирается только одним запросом, захватившим блокировку,
+    остальные в это время получают устаревшие данные.
+    """
+
+    key = get_recipe_list_cache_key(request)
+    generation = get_recipe_list_generation()
+    entry = cache.get(key)
+
+    if entry is not None:
+        entry_generation, fresh_until, data = entry
+        if entry_generation == generation and fresh_until > time.time():
+            return data
+        if not cache.add(
+            f'{key}:lock', True, RECIPE_LIST_CACHE_LOCK_TIMEOUT
+        ):
+            return data
+
+    try:
+        data = build()
+        cache.set(
+            key,
+            (generation, time.time() + RECIPE_LIST_CACHE_FRESH, data),
+            RECIPE_LIST_CACHE_TIMEOUT
+        )
+    finally:
+        if entry is not None:
+            cache.delete(f'{key}:lock')
+    return data
+
+
+def get_or_build_tag_facets(signature, build):
+    """
+    Метод возвращает число рецептов по тегам для набора фильтров
+    из кэша; запись устаревает со сменой поколения списка рецептов.
+    """
+
+    signature = repr((get_recipe_list_generation(), signature))
+    key = f'recipes:facets:{hashlib.md5(signature.encode()).hexdigest()}'
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, RECIPE_LIST_CACHE_TIMEOUT)
+    return data
+
+
+def get_recipe_fragment_key(recipe, host, fields):
+    """
+    Метод формирует ключ фрагмента рецепта с учётом его версии
+    и набора выбранных полей.
+    """
+
+    version = int(recipe.updated_at.timestamp() * 1_000_000)
+    fieldset = hashlib.md5(','.join(fields).encode()).hexdigest()[:8]
+    return f'recipes:fragment:{host}:{fieldset}:{recipe.pk}:{version}'
+
+
+def get_recipe_fragments(recipes, host, fields, build_many):
+    """
+    Метод возвращает независимые от пользователя фрагменты рецептов.
+
+    Отсутствующие в кэше фрагменты собираются одним вызовом
+    build_many и сохраняются в кэш.
+    """
+
+    keys = {
+        recipe.pk: get_recipe_fragment_key(recipe, host, fields)
+        for recipe in recipes
+    }
+    cached = cache.get_many(keys.values())
+    missing = [recipe for recipe in recipes if keys[recipe.pk] not in cached]
+    if missing:
+        built = {
+            keys[pk]: fragment
+            for pk, fragment in build_many(missing).items()
+        }
+        cache.set_many(built, RECIPE_FRAGMENT_CACHE_TIMEOUT)
+        cached.update(built)
+    return {pk: cached[key] for pk, key in keys.items() if key in cached}
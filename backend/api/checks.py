@@ -0,0 +1,22 @@
+from django.core.checks import Error, Tags, register
+
+from .cache import is_shared_cache
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Проверка при развёртывании: ограничение частоты запросов
+    и ключи идемпотентности требуют общего для процессов кэша.
+    """
+
+    if is_shared_cache():
+        return []
+    return [Error(
+        'Кэш по умолчанию хранится в памяти процесса.',
+        hint=(
+            'Задайте CACHE_BACKEND и CACHE_LOCATION общего кэша, '
+            'например memcached.'
+        ),
+        id='api.E001',
+    )]
@@ -0,0 +1,82 @@
+import logging
+from datetime import timedelta
+
+from django.utils import timezone
+
+from foodgram.constants import DOCUMENT_JOB_STALE_AFTER
+from foodgram.tasks import run_in_pool
+from recipes.models import DocumentJob, ShoppingListItem
+
+from .utils import generate_shopping_cart_pdf
+
+logger = logging.getLogger(__name__)
+
+
+def get_shopping_list_items(user):
+    """
+    Метод возвращает позиции списка покупок пользователя.
+    """
+
+    return ShoppingListItem.objects.filter(
+        user=user, amount__gt=0
+    ).select_related('ingredient').order_by('ingredient__name')
+
+
+def enqueue_shopping_cart_job(user):
+    """
+    Метод создаёт задачу генерации списка покупок
+    и ставит её в пул генерации документов.
+    """
+
+    job = DocumentJob.objects.create(user=user)
+    run_in_pool('documents', run_document_job, job.pk)
+    return job
+
+
+def run_document_job(job_id):
+    """
+    Метод выполняет задачу генерации документа, если она ещё
+    не захвачена другим исполнителем.
+    """
+
+    claimed = DocumentJob.objects.filter(
+        pk=job_id, status=DocumentJob.PENDING
+    ).update(status=DocumentJob.RUNNING, started_at=timezone.now())
+    if not claimed:
+        return
+    job = DocumentJob.objects.select_related('user').get(pk=job_id)
+    try:
+        file_name = generate_shopping_cart_pdf(
+            get_shopping_list_items(job.user), job.user,
+            file_name=f'shopping_cart_{job.pk.hex}.pdf'
+        )
+    except Exception as error:
+        logger.exception('Ошибка генерации документа %s', job_id)
+        DocumentJob.objects.filter(pk=job_id).update(
+            status=DocumentJob.FAILED,
+            error=str(error),
+            finished_at=timezone.now()
+        )
+        return
+    DocumentJob.objects.filter(pk=job_id).update(
+        status=DocumentJob.DONE,
+        file_name=file_name,
+        finished_at=timezone.now()
+    )
+
+
+def process_stale_jobs():
+    """
+    Метод возвращает в очередь задачи, потерянные при перезапуске
+    воркеров, и повторно отправляет их на выполнение.
+    """
+
+    stale = timezone.now() - timedelta(seconds=DOCUMENT_JOB_STALE_AFTER)
+    DocumentJob.objects.filter(
+        status=DocumentJob.RUNNING, started_at__lt=stale
+    ).update(status=DocumentJob.PENDING)
+    job_ids = DocumentJob.objects.filter(
+        status=DocumentJob.PENDING, created_at__lt=stale
+    ).values_list('pk', flat=True)
+    for job_id in job_ids:
+        run_in_pool('documents', run_document_job, job_id)
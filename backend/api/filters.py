@@ -1,5 +1,9 @@
 import django_filters as filters
+from django.db import connection
+from django.db.models import BooleanField, Case, Value, When
+from django.db.models.functions import Collate, Lower
 
+from foodgram.constants import BINARY_COLLATIONS
 from recipes.models import Ingredient, Recipe
 
 
@@ -59,11 +63,46 @@ class RecipeFilter(filters.FilterSet):
 
 class IngredientFilter(filters.FilterSet):
     """
-    Фильтр для ингредиентов.
+    Фильтр для ингредиентов с тем же порядком, что и поиск
+    по снимку каталога: без учёта регистра, сначала названия,
+    начинающиеся с запроса, затем содержащие его; внутри групп —
+    по названию в нижнем регистре побайтово, затем по id.
     """
 
-    name = filters.CharFilter(field_name='name', lookup_expr='contains')
+    name = filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
-        fields = '__all__'
+        fields = ('name', )
+
+    def get_name_ordering(self):
+        """
+        Метод возвращает порядок ингредиентов по названию.
+        """
+
+        return (
+            Collate(Lower('name'), BINARY_COLLATIONS[connection.vendor]),
+            'id'
+        )
+
+    def filter_queryset(self, queryset):
+        """
+        Метод упорядочивает ингредиенты по названию до фильтрации.
+        """
+
+        return super().filter_queryset(
+            queryset.order_by(*self.get_name_ordering())
+        )
+
+    def filter_name(self, queryset, name, value):
+        """
+        Метод для поиска ингредиентов по части названия.
+        """
+
+        return queryset.filter(name__icontains=value).annotate(
+            is_prefix=Case(
+                When(name__istartswith=value, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField()
+            )
+        ).order_by('-is_prefix', *self.get_name_ordering())
@@ -0,0 +1,111 @@
+import hashlib
+from functools import wraps
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from foodgram.constants import (IDEMPOTENCY_KEY_TTL, IDEMPOTENCY_LOCK_TIMEOUT,
+                                MAX_IDEMPOTENCY_KEY)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADERS = ('Location', )
+
+
+def get_request_fingerprint(request):
+    """
+    Метод возвращает отпечаток запроса: метод, путь и тело.
+    """
+
+    digest = hashlib.md5(f'{request.method} {request.path}'.encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def replay_response(record, fingerprint):
+    """
+    Метод возвращает сохранённый ответ или 422, если ключ
+    использован для запроса с другим отпечатком.
+    """
+
+    record_fingerprint, status_code, data, headers = record
+    if record_fingerprint != fingerprint:
+        return Response(
+            {'detail': 'Ключ идемпотентности использован '
+                       'для другого запроса.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    response = Response(data, status=status_code, headers=headers)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(method):
+    """
+    Декоратор повторяет сохранённый ответ на запрос
+    с уже встречавшимся заголовком Idempotency-Key.
+
+    Ключ действует в пределах пользователя. Ответ первого запроса,
+    кроме ошибок сервера, хранится в кэше компактной записью,
+    повтор запроса возвращает её без выполнения представления.
+    Ошибки клиента, выброшенные исключениями, сохраняются в виде
+    ответа, построенного обработчиком исключений представления.
+    Пока первый запрос не завершён, повтор получает 409,
+    повтор ключа с другим телом запроса получает 422.
+
+    Запись перечитывается после взятия блокировки: первый запрос
+    мог завершиться между проверкой и блокировкой. Блокировка
+    работает только с общим для процессов кэшем (проверка api.E001).
+    """
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or not request.user.is_authenticated:
+            return method(self, request, *args, **kwargs)
+        if len(key) > MAX_IDEMPOTENCY_KEY:
+            return Response(
+                {'detail': 'Слишком длинный ключ идемпотентности.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        digest = hashlib.md5(key.encode()).hexdigest()
+        cache_key = f'idempotency:{request.user.pk}:{digest}'
+        fingerprint = get_request_fingerprint(request)
+        record = cache.get(cache_key)
+        if record is not None:
+            return replay_response(record, fingerprint)
+        if not cache.add(f'{cache_key}:lock', True, IDEMPOTENCY_LOCK_TIMEOUT):
+            return Response(
+                {'detail': 'Запрос с этим ключом ещё выполняется.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        try:
+            record = cache.get(cache_key)
+            if record is not None:
+                return replay_response(record, fingerprint)
+            try:
+                response = method(self, request, *args, **kwargs)
+            except APIException as exc:
+                response = self.handle_exception(exc)
+            if response.status_code < 500:
+                cache.set(
+                    cache_key,
+                    (
+                        fingerprint,
+                        response.status_code,
+                        response.data,
+                        {
+                            header: response[header]
+                            for header in REPLAYED_HEADERS
+                            if response.has_header(header)
+                        }
+                    ),
+                    IDEMPOTENCY_KEY_TTL
+                )
+            return response
+        finally:
+            cache.delete(f'{cache_key}:lock')
+
+    return wrapper
@@ -1,4 +1,36 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+import math
+from datetime import datetime, timedelta
+from heapq import merge
+from itertools import islice
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from foodgram.constants import MAX_PAGE_SIZE, RECIPE_CHANGES_LAG
+from recipes.feed import get_pulled_author_ids
+from recipes.models import FeedEntry, Recipe, RecipeDeletion
+
+
+def parse_cursor_datetime(value):
+    """
+    Метод разбирает время из курсора; для значения другого типа
+    или неверного формата возвращает None.
+    """
+
+    if not isinstance(value, str):
+        return None
+    try:
+        return parse_datetime(value)
+    except ValueError:
+        return None
 
 
 class PageNumberWithLimitPagination(PageNumberPagination):
@@ -8,3 +40,292 @@ class PageNumberWithLimitPagination(PageNumberPagination):
     """
 
     page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу: следующая страница выбирается условием
+    на значения полей сортировки последнего элемента, без OFFSET и COUNT.
+    """
+
+    ordering = ('-created_at', '-id', )
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    # Тип значения курсора для полей сортировки; время передаётся
+    # строкой ISO 8601.
+    cursor_types = {
+        'created_at': datetime,
+        'updated_at': datetime,
+        'id': int,
+        'popularity': int,
+        'trending': float,
+        'username': str,
+    }
+
+    def get_page_size(self, request):
+        """
+        Метод возвращает размер страницы из параметра limit.
+        """
+
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        """
+        Метод возвращает значения полей сортировки из курсора запроса.
+        """
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError):
+            raise NotFound('Некорректный курсор.')
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound('Некорректный курсор.')
+        for field, value in zip(self.ordering, values):
+            if not self.is_cursor_value(field, value):
+                raise NotFound('Некорректный курсор.')
+        return values
+
+    def is_cursor_value(self, field, value):
+        """
+        Метод проверяет, что значение курсора — скаляр того типа,
+        который ожидает поле сортировки.
+        """
+
+        expected = self.cursor_types.get(field.lstrip('-'))
+        if expected is datetime:
+            return parse_cursor_datetime(value) is not None
+        if expected is str:
+            return isinstance(value, str)
+        if isinstance(value, bool):
+            return False
+        if expected is float:
+            return isinstance(value, (int, float)) and math.isfinite(value)
+        if expected is int:
+            return isinstance(value, int) and -2 ** 63 <= value < 2 ** 63
+        return isinstance(value, (str, int, float))
+
+    def encode_cursor(self, values):
+        """
+        Метод упаковывает значения полей сортировки в курсор.
+        """
+
+        values = [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in values
+        ]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def get_keyset_filter(self, values, ordering=None):
+        """
+        Метод возвращает условие выборки элементов после курсора.
+        """
+
+        ordering = ordering or self.ordering
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_item_values(self, item, ordering=None):
+        """
+        Метод возвращает значения полей сортировки элемента.
+        """
+
+        values = []
+        for field in ordering or self.ordering:
+            value = item
+            for attr in field.lstrip('-').split('__'):
+                value = getattr(value, attr)
+            values.append(value)
+        return values
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Метод возвращает страницу элементов после курсора.
+        """
+
+        self.request = request
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_keyset_filter(cursor))
+        page_size = self.get_page_size(request)
+        items = list(queryset.order_by(*self.ordering)[:page_size + 1])
+        return self.paginate_items(items, page_size)
+
+    def paginate_items(self, items, page_size, ordering=None):
+        """
+        Метод обрезает упорядоченные элементы до страницы
+        и запоминает курсор следующей.
+        """
+
+        self.next_cursor = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            self.next_cursor = self.encode_cursor(
+                self.get_item_values(items[-1], ordering)
+            )
+        return items
+
+    def get_next_link(self):
+        """
+        Метод возвращает ссылку на следующую страницу.
+        """
+
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.next_cursor
+        )
+
+    def get_paginated_response(self, data):
+        """
+        Метод возвращает ответ со ссылкой на следующую страницу.
+        """
+
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Пагинация ленты подписок: записи ленты пользователя объединяются
+    с рецептами крупных авторов, которые не рассылаются по лентам.
+    """
+
+    ordering = ('-created_at', '-id', )
+    entry_ordering = ('-created_at', '-recipe_id', )
+
+    def paginate_feed(self, user, request):
+        """
+        Метод возвращает страницу рецептов ленты пользователя.
+        """
+
+        self.request = request
+        cursor = self.decode_cursor(request)
+        page_size = self.get_page_size(request)
+
+        entries = FeedEntry.objects.filter(user=user)
+        pulled = Recipe.objects.filter(
+            author_id__in=get_pulled_author_ids(user)
+        )
+        if cursor is not None:
+            entries = entries.filter(
+                self.get_keyset_filter(cursor, self.entry_ordering)
+            )
+            pulled = pulled.filter(self.get_keyset_filter(cursor))
+        rows = list(entries.order_by(*self.entry_ordering).values_list(
+            'created_at', 'recipe_id'
+        )[:page_size + 1])
+        rows += pulled.order_by(*self.ordering).values_list(
+            'created_at', 'id'
+        )[:page_size + 1]
+        recipe_ids = []
+        for _, recipe_id in sorted(set(rows), reverse=True):
+            recipe_ids.append(recipe_id)
+            if len(recipe_ids) > page_size:
+                break
+
+        recipes = Recipe.objects.only(
+            'id', 'created_at', 'updated_at'
+        ).in_bulk(recipe_ids)
+        items = [
+            recipes[recipe_id] for recipe_id in recipe_ids
+            if recipe_id in recipes
+        ]
+        return self.paginate_items(items, page_size)
+
+
+class RecipeChangesPagination(KeysetPagination):
+    """
+    Пагинация журнала изменений рецептов: изменённые рецепты
+    и записи об удалении в порядке времени изменения.
+
+    Изменения последних RECIPE_CHANGES_LAG секунд не выдаются,
+    чтобы транзакции, ещё не зафиксированные к моменту запроса,
+    не оказались позади выданного курсора.
+    """
+
+    ordering = ('updated_at', 'id', )
+    deletion_ordering = ('deleted_at', 'recipe_id', )
+    cursor_query_param = 'since'
+
+    def paginate_changes(self, queryset, request):
+        """
+        Метод возвращает страницу изменений после курсора:
+        пары (рецепт или None для удалённого, идентификатор).
+        """
+
+        self.request = request
+        self.cursor = self.decode_cursor(request)
+        page_size = self.get_page_size(request)
+
+        until = timezone.now() - timedelta(seconds=RECIPE_CHANGES_LAG)
+        recipes = queryset.filter(updated_at__lt=until)
+        deletions = RecipeDeletion.objects.filter(deleted_at__lt=until)
+        if self.cursor is not None:
+            recipes = recipes.filter(self.get_keyset_filter(self.cursor))
+            deletions = deletions.filter(
+                self.get_keyset_filter(self.cursor, self.deletion_ordering)
+            )
+        changes = list(islice(merge(
+            (
+                (recipe.updated_at, recipe.pk, recipe)
+                for recipe in recipes.order_by(*self.ordering)[:page_size + 1]
+            ),
+            (
+                (deleted_at, recipe_id, None)
+                for deleted_at, recipe_id in deletions.order_by(
+                    *self.deletion_ordering
+                ).values_list(*self.deletion_ordering)[:page_size + 1]
+            ),
+            key=lambda change: change[:2]
+        ), page_size + 1))
+
+        self.next_cursor = None
+        if len(changes) > page_size:
+            changes = changes[:page_size]
+            self.next_cursor = self.encode_cursor(changes[-1][:2])
+        self.resume_cursor = (
+            self.encode_cursor(changes[-1][:2]) if changes
+            else request.query_params.get(self.cursor_query_param)
+        )
+        return [(recipe, recipe_id) for _, recipe_id, recipe in changes]
+
+    def get_since(self):
+        """
+        Метод возвращает время из курсора запроса.
+        """
+
+        if self.cursor is None:
+            return None
+        since = parse_cursor_datetime(self.cursor[0])
+        if since is None:
+            raise NotFound('Некорректный курсор.')
+        return since
+
+    def get_paginated_response(self, data):
+        """
+        Метод возвращает ответ с курсором для продолжения синхронизации.
+        """
+
+        return Response({
+            'next': self.get_next_link(),
+            'cursor': self.resume_cursor,
+            'results': data,
+        })
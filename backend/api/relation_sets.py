@@ -0,0 +1,67 @@
+from recipes.models import Favorite, ShoppingCart, Subscription
+
+from .cache import get_user_relation_ids
+
+RELATION_QUERIES = {
+    'favorites': (Favorite, 'recipe_id'),
+    'shopping_cart': (ShoppingCart, 'recipe_id'),
+    'subscriptions': (Subscription, 'author_id'),
+}
+
+
+class UserRelationSets:
+    """
+    Связи текущего пользователя в виде множеств идентификаторов.
+
+    Каждое множество загружается при первом обращении один раз
+    за запрос, поэтому флаги объектов проверяются без запросов.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.sets = {}
+
+    def get(self, name):
+        """
+        Метод возвращает множество идентификаторов связи по имени.
+        """
+
+        if name not in self.sets:
+            if self.user is None or not self.user.is_authenticated:
+                self.sets[name] = frozenset()
+            else:
+                model, field_name = RELATION_QUERIES[name]
+                self.sets[name] = get_user_relation_ids(
+                    self.user.pk, name,
+                    lambda: model.objects.filter(
+                        user=self.user
+                    ).values_list(field_name, flat=True)
+                )
+        return self.sets[name]
+
+    @property
+    def favorite_ids(self):
+        return self.get('favorites')
+
+    @property
+    def shopping_cart_ids(self):
+        return self.get('shopping_cart')
+
+    @property
+    def subscribed_author_ids(self):
+        return self.get('subscriptions')
+
+
+def get_relation_sets(request):
+    """
+    Метод возвращает связи пользователя запроса, общие для всех
+    сериализаторов этого запроса.
+    """
+
+    if request is None:
+        return UserRelationSets(None)
+    relation_sets = getattr(request, '_relation_sets', None)
+    if relation_sets is None:
+        relation_sets = UserRelationSets(request.user)
+        request._relation_sets = relation_sets
+    return relation_sets
@@ -1,12 +1,26 @@
 from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.urls import reverse
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
-from users.serializers import Base64ImageField, UserSerializer
+from foodgram.constants import PANTRY_MAX_INGREDIENTS
+from recipes.models import (DocumentJob, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from recipes.relations import add_relation, remove_relation
+from recipes.shopping_list import get_recipe_amounts
+from recipes.signals import recipe_ingredients_changed
+from users.serializers import (Base64ImageField, SparseFieldsetMixin,
+                               UserSerializer)
+
+from .cache import get_recipe_fragments
+from .relation_sets import get_relation_sets
 
 User = get_user_model
 
+RECIPE_USER_FIELDS = ('is_favorited', 'is_in_shopping_cart', )
+RECIPE_COLUMN_FIELDS = ('name', 'image', 'text', 'cooking_time', )
+
 
 class TagSerializer(serializers.ModelSerializer):
     """
@@ -44,7 +58,21 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount', )
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(serializers.ListSerializer):
+    """
+    Сериализатор списка рецептов, собирающий их представления пакетом.
+    """
+
+    def to_representation(self, data):
+        """
+        Метод для выдачи списка рецептов одним пакетом.
+        """
+
+        recipes = data.all() if isinstance(data, models.Manager) else data
+        return self.child.to_representation_many(list(recipes))
+
+
+class RecipeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Сериализатор для выдачи рецептов.
     """
@@ -65,6 +93,104 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_favorited', 'is_in_shopping_cart',
             'name', 'image', 'text', 'cooking_time',
         )
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        """
+        Метод для выдачи одного рецепта.
+        """
+
+        return self.to_representation_many([instance])[0]
+
+    def to_representation_many(self, recipes):
+        """
+        Метод собирает представления рецептов из закэшированных
+        фрагментов и флагов текущего пользователя.
+        """
+
+        request = self.context.get('request')
+        host = request.get_host() if request else ''
+        fields = tuple(self.fields)
+        fragments = get_recipe_fragments(
+            recipes, host, fields, self.build_fragments
+        )
+        relation_sets = get_relation_sets(request)
+        return [
+            self.merge_flags(fragments[recipe.pk], recipe, relation_sets)
+            for recipe in recipes
+        ]
+
+    def get_fragment_queryset(self, recipes):
+        """
+        Метод возвращает запрос рецептов, загружающий только столбцы
+        и связи, нужные выбранным полям.
+        """
+
+        fields = self.fields
+        columns = ['id', 'updated_at']
+        columns += [name for name in RECIPE_COLUMN_FIELDS if name in fields]
+        queryset = Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in recipes]
+        )
+        if 'author' in fields:
+            columns.append('author')
+            queryset = queryset.select_related('author')
+        if 'tags' in fields:
+            queryset = queryset.prefetch_related('tags')
+        if 'ingredients' in fields:
+            queryset = queryset.prefetch_related(
+                'recipe_ingredients__ingredient'
+            )
+        return queryset.only(*columns)
+
+    def build_fragments(self, recipes):
+        """
+        Метод собирает независимые от пользователя фрагменты рецептов.
+
+        Флаги пользователя не входят во фрагмент и не вычисляются:
+        на время сборки корневой сериализатор получает копию контекста
+        с пустыми подписками, общий с вызывающим контекст не меняется.
+        """
+
+        root = self.root
+        context = root._context
+        root._context = {**context, 'subscribed_author_ids': frozenset()}
+        try:
+            fragments = {}
+            for recipe in self.get_fragment_queryset(recipes):
+                data = super().to_representation(recipe)
+                for field_name in RECIPE_USER_FIELDS:
+                    if field_name in data:
+                        data[field_name] = False
+                if 'author' in data:
+                    data['author']['is_subscribed'] = False
+                fragments[recipe.pk] = data
+        finally:
+            root._context = context
+        return fragments
+
+    def merge_flags(self, fragment, recipe, relation_sets):
+        """
+        Метод дополняет фрагмент рецепта флагами текущего пользователя
+        по множествам его связей.
+        """
+
+        data = dict(fragment)
+        if 'author' in data:
+            data['author'] = dict(
+                fragment['author'],
+                is_subscribed=(
+                    fragment['author']['id']
+                    in relation_sets.subscribed_author_ids
+                )
+            )
+        if 'is_favorited' in data:
+            data['is_favorited'] = recipe.pk in relation_sets.favorite_ids
+        if 'is_in_shopping_cart' in data:
+            data['is_in_shopping_cart'] = (
+                recipe.pk in relation_sets.shopping_cart_ids
+            )
+        return data
 
     def get_is_favorited(self, obj):
         """
@@ -72,11 +198,9 @@ class RecipeSerializer(serializers.ModelSerializer):
         добавлен ли рецепт в избранное пользователем.
         """
 
-        request = self.context.get('request')
-        return (
-            request.user.is_authenticated
-            and Favorite.objects.filter(user=request.user, recipe=obj).exists()
-        )
+        return obj.pk in get_relation_sets(
+            self.context.get('request')
+        ).favorite_ids
 
     def get_is_in_shopping_cart(self, obj):
         """
@@ -84,13 +208,21 @@ class RecipeSerializer(serializers.ModelSerializer):
         добавлен ли рецепт в список покупок пользователем.
         """
 
-        request = self.context.get('request')
-        return (
-            request.user.is_authenticated
-            and ShoppingCart.objects.filter(
-                user=request.user, recipe=obj
-            ).exists()
-        )
+        return obj.pk in get_relation_sets(
+            self.context.get('request')
+        ).shopping_cart_ids
+
+
+class PantrySerializer(serializers.Serializer):
+    """
+    Сериализатор для списка имеющихся ингредиентов.
+    """
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=PANTRY_MAX_INGREDIENTS
+    )
 
 
 class RecipeCreateUpdateIngredientSerializer(serializers.ModelSerializer):
@@ -192,6 +324,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
 
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         """
         Метод для создания рецепта.
@@ -211,9 +344,11 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
                 amount=ingredient_data['amount']
             )
         recipe.tags.set(tags_data)
+        recipe_ingredients_changed.send(sender=Recipe, recipe=recipe)
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """
         Метод для изменения рецепта.
@@ -229,6 +364,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
 
         if 'ingredients' in validated_data:
             ingredients_data = validated_data.pop('ingredients')
+            previous = get_recipe_amounts(instance)
             RecipeIngredient.objects.filter(recipe=instance).delete()
             for ingredient_data in ingredients_data:
                 ingredient = Ingredient.objects.get(id=ingredient_data['id'])
@@ -237,6 +373,9 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
                     ingredient=ingredient,
                     amount=ingredient_data['amount']
                 )
+            recipe_ingredients_changed.send(
+                sender=Recipe, recipe=instance, previous=previous
+            )
 
         if 'tags' in validated_data:
             tags_data = validated_data.pop('tags')
@@ -254,11 +393,17 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         return RecipeSerializer(instance, context=self.context).data
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class RecipeRelationSerializer(serializers.ModelSerializer):
     """
-    Сериализатор работы с избранным.
+    Базовый сериализатор связи пользователя с рецептом.
+
+    Добавление и удаление выполняются одним запросом к базе,
+    повторная операция отклоняется по числу затронутых строк.
     """
 
+    already_added_message = None
+    not_added_message = None
+
     id = serializers.IntegerField(source='recipe.id', read_only=True)
     name = serializers.CharField(source='recipe.name', read_only=True)
     image = serializers.ImageField(source='recipe.image', read_only=True)
@@ -268,108 +413,95 @@ class FavoriteSerializer(serializers.ModelSerializer):
     )
 
     class Meta:
-        model = Favorite
         fields = ('id', 'name', 'image', 'cooking_time', )
 
-    def validate(self, data):
-        """
-        Валидация входных данных сериализатора.
-        """
-
-        user = self.context['request'].user
-        recipe = self.context['recipe']
-
-        if 'DELETE' in self.context['request'].method:
-            if not Favorite.objects.filter(user=user, recipe=recipe).exists():
-                raise serializers.ValidationError(
-                    'Этот рецепт не был добавлен в избранное, '
-                    'его нельзя удалить.'
-                )
-
-        if 'POST' in self.context['request'].method:
-            if Favorite.objects.filter(user=user, recipe=recipe).exists():
-                raise serializers.ValidationError(
-                    'Этот рецепт уже добавлен в избранное.'
-                )
-
-        return data
-
     def create(self, validated_data):
         """
-        Метод для добавления в избранное.
+        Метод добавляет рецепт в связь с пользователем.
         """
 
         user = self.context['request'].user
         recipe = self.context['recipe']
-        favorite = Favorite.objects.create(user=user, recipe=recipe)
-        return favorite
+        if not add_relation(self.Meta.model, user, recipe):
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    self.already_added_message
+                ]
+            })
+        return self.Meta.model(user=user, recipe=recipe)
 
     def delete(self):
         """
-        Метод для удаления из избранного.
+        Метод удаляет рецепт из связи с пользователем.
         """
 
         user = self.context['request'].user
         recipe = self.context['recipe']
-        Favorite.objects.filter(user=user, recipe=recipe).delete()
+        if not remove_relation(self.Meta.model, user, recipe):
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [self.not_added_message]
+            })
+
+
+class FavoriteSerializer(RecipeRelationSerializer):
+    """
+    Сериализатор работы с избранным.
+    """
+
+    already_added_message = 'Этот рецепт уже добавлен в избранное.'
+    not_added_message = (
+        'Этот рецепт не был добавлен в избранное, его нельзя удалить.'
+    )
+
+    class Meta(RecipeRelationSerializer.Meta):
+        model = Favorite
 
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
+class ShoppingCartSerializer(RecipeRelationSerializer):
     """
     Сериализатор для работы с корзиной.
     """
 
-    id = serializers.IntegerField(source='recipe.id', read_only=True)
-    name = serializers.CharField(source='recipe.name', read_only=True)
-    image = serializers.ImageField(source='recipe.image', read_only=True)
-    cooking_time = serializers.IntegerField(
-        source='recipe.cooking_time',
-        read_only=True
+    already_added_message = 'Этот рецепт уже добавлен в список покупок.'
+    not_added_message = (
+        'Этот рецепт не был добавлен в список покупок, его нельзя удалить.'
     )
 
-    class Meta:
+    class Meta(RecipeRelationSerializer.Meta):
         model = ShoppingCart
-        fields = ('id', 'name', 'image', 'cooking_time', )
 
-    def validate(self, data):
-        """
-        Валидация входных данных сериализатора.
-        """
-
-        user = self.context['request'].user
-        recipe = self.context['recipe']
 
-        if 'DELETE' in self.context['request'].method:
-            if not ShoppingCart.objects.filter(
-                user=user,
-                recipe=recipe
-            ).exists():
-                raise serializers.ValidationError(
-                    'Этот рецепт не был добавлен в список покупок, '
-                    'его нельзя удалить.'
-                )
+class DocumentJobSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор задачи фоновой генерации документа.
+    """
 
-        if 'POST' in self.context['request'].method:
-            if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
-                raise serializers.ValidationError(
-                    'Этот рецепт уже добавлен в список покупок.'
-                )
+    url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
 
-        return data
+    class Meta:
+        model = DocumentJob
+        fields = (
+            'id', 'status', 'error', 'created_at', 'finished_at',
+            'url', 'download_url',
+        )
 
-    def create(self, validated_data):
+    def get_url(self, obj):
         """
-        Метод для добавления рецепта в корзину.
+        Метод возвращает адрес для опроса статуса задачи.
         """
-        user = self.context['request'].user
-        recipe = self.context['recipe']
-        favorite = ShoppingCart.objects.create(user=user, recipe=recipe)
-        return favorite
 
-    def delete(self):
+        return self.context['request'].build_absolute_uri(
+            reverse('job-detail', args=[obj.pk])
+        )
+
+    def get_download_url(self, obj):
         """
-        Метод для удаления рецепта из корзины.
+        Метод возвращает адрес готового документа.
         """
-        user = self.context['request'].user
-        recipe = self.context['recipe']
-        ShoppingCart.objects.filter(user=user, recipe=recipe).delete()
+
+        if obj.status != DocumentJob.DONE:
+            return None
+        return self.context['request'].build_absolute_uri(
+            reverse('job-download', args=[obj.pk])
+        )
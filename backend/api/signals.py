@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import (Favorite, Recipe, RecipeIngredient, ShoppingCart,
+                            Subscription)
+from recipes.signals import recipe_relation_changed, recipes_imported
+
+from .cache import bump_recipe_list_generation, bump_user_relations_generation
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(recipes_imported, sender=Recipe)
+def invalidate_recipe_list(sender, **kwargs):
+    """
+    Сброс кэша списка рецептов при изменении рецепта или его связей.
+
+    Поколение меняется после фиксации транзакции: иначе конкурентный
+    запрос успел бы собрать страницу из ещё старых данных и сохранить
+    её под новым поколением.
+    """
+
+    transaction.on_commit(bump_recipe_list_generation)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_recipe_list_on_author_change(sender, **kwargs):
+    """
+    Сброс кэша списка рецептов при изменении профиля автора.
+    """
+
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(bump_recipe_list_generation)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_user_relations(sender, instance, **kwargs):
+    """
+    Сброс кэшей, зависящих от избранного, корзины и подписок пользователя,
+    после фиксации транзакции: иначе параллельный запрос успеет
+    закэшировать под новым поколением ещё не зафиксированные связи.
+    """
+
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_user_relations_generation(user_id))
+
+
+@receiver(recipe_relation_changed)
+def invalidate_user_relations_on_change(sender, user, **kwargs):
+    """
+    Сброс кэшей, зависящих от избранного и корзины пользователя,
+    после фиксации изменения связи в обход сигналов моделей.
+    """
+
+    user_id = user.pk
+    transaction.on_commit(lambda: bump_user_relations_generation(user_id))
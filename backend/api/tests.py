@@ -1,8 +1,47 @@
+import base64
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
+from threading import Barrier
+from unittest import mock, skipIf
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
-from rest_framework.test import APIClient
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import OperationalError, connection
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.cache import get_user_relations_generation
+from api.checks import check_shared_cache
+from api.serializers import RecipeSerializer
+from api.throttling import ActionTokenBucketThrottle
+from foodgram.delivery import XAccelRedirectFileDelivery
+from foodgram.routers import ReplicaRouter, request_routing
+from foodgram.settings import PDF_DIR
+from foodgram.storage import ContentAddressedStorage
+from recipes.ingredient_index import (get_similar_recipe_ids, index_recipe,
+                                      match_pantry, pack_ids, rebuild_index,
+                                      unpack_ids)
+from recipes.management.commands.startup_report import measure_imports
+from recipes.media import collect_garbage
+from recipes.scores import update_recipe_scores
+from recipes.transfer import export_recipes, import_recipes
+from users.serializers import UserSerializer
+from recipes.models import (DocumentJob, Favorite, FeedEntry, Ingredient,
+                            IngredientPosting, LargeAuthor, MediaFile, Recipe,
+                            RecipeActivity, RecipeIngredient,
+                            RecipeIngredientSet, RecipeScore, ShoppingCart,
+                            ShoppingListItem, Subscription, Tag)
 
 
 class CatsAPITestCase(TestCase):
@@ -16,3 +55,1292 @@ class CatsAPITestCase(TestCase):
         """Проверка доступности основного эндпоинта."""
         response = self.client.get('/api/recipes/')
         self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class RecipeListCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        self.guest_client = APIClient()
+
+    def create_recipe(self, name='Рецепт'):
+        return Recipe.objects.create(
+            author=self.author, name=name, text='Описание',
+            cooking_time=1, image='recipes/images/test.png'
+        )
+
+    def test_anonymous_list_invalidated_on_write(self):
+        """Изменение рецепта сбрасывает кэш анонимного списка."""
+        response = self.guest_client.get('/api/recipes/')
+        self.assertEqual(response.data['count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.create_recipe()
+            # До фиксации транзакции поколение кэша не меняется.
+            response = self.guest_client.get('/api/recipes/')
+            self.assertEqual(response.data['count'], 0)
+        response = self.guest_client.get('/api/recipes/')
+        self.assertEqual(response.data['count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.name = 'Новое название'
+            recipe.save()
+        response = self.guest_client.get('/api/recipes/')
+        self.assertEqual(
+            response.data['results'][0]['name'], 'Новое название'
+        )
+
+    def test_anonymous_list_served_from_cache(self):
+        """Повторный анонимный запрос не обращается к базе данных."""
+        self.create_recipe()
+        self.guest_client.get('/api/recipes/?limit=1')
+        with self.assertNumQueries(0):
+            response = self.guest_client.get('/api/recipes/?limit=1')
+        self.assertEqual(response.data['count'], 1)
+
+
+class TagFacetsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.breakfast, self.dinner = (
+            Tag.objects.create(name='Завтрак', slug='breakfast'),
+            Tag.objects.create(name='Ужин', slug='dinner'),
+        )
+        self.recipes = []
+        for tags in ((self.breakfast, ), (self.breakfast, self.dinner)):
+            recipe = Recipe.objects.create(
+                author=self.user, name='Рецепт', text='Описание',
+                cooking_time=1, image='recipes/images/test.png'
+            )
+            recipe.tags.set(tags)
+            self.recipes.append(recipe)
+
+    def get_facets(self, query=''):
+        return self.client.get(
+            f'/api/recipes/?facets=tags{query}'
+        ).data['facets']['tags']
+
+    def test_facets_ignore_tag_filter(self):
+        """Счётчики тегов считаются по фильтрам без учёта тегов."""
+        url = '/api/recipes/?facets=tags&tags=dinner'
+        APIClient().get(url)
+        with self.assertNumQueries(0):
+            response = APIClient().get(url)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(
+            response.data['facets']['tags'], {'breakfast': 2, 'dinner': 1}
+        )
+        self.assertNotIn('facets', APIClient().get('/api/recipes/').data)
+
+    def test_favorite_facets_follow_relations(self):
+        """Счётчики по избранному обновляются после изменения избранного."""
+        self.assertEqual(self.get_facets('&is_favorited=1'), {})
+        self.client.post(f'/api/recipes/{self.recipes[1].id}/favorite/')
+        self.assertEqual(
+            self.get_facets('&is_favorited=1'), {'breakfast': 1, 'dinner': 1}
+        )
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class RecipeFragmentCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        self.user = User.objects.create_user(
+            username='reader', email='reader@example.com'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=1, image='recipes/images/test.png'
+            )
+            for number in range(3)
+        ]
+        Favorite.objects.create(user=self.user, recipe=self.recipes[0])
+
+    @mock.patch('api.cache.is_shared_cache', return_value=True)
+    def test_cached_page_merges_user_flags(self, is_shared_cache):
+        """Закэшированные фрагменты дополняются флагами пользователя."""
+        self.client.get('/api/recipes/')
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/recipes/')
+        favorited = {
+            recipe['id']: recipe['is_favorited']
+            for recipe in response.data['results']
+        }
+        self.assertEqual(favorited, {
+            self.recipes[0].id: True,
+            self.recipes[1].id: False,
+            self.recipes[2].id: False,
+        })
+
+    def test_local_cache_keeps_relations_per_request(self):
+        """С кэшем в памяти процесса связи читаются в каждом запросе."""
+        self.client.get('/api/recipes/')
+        with self.assertNumQueries(5):
+            self.client.get('/api/recipes/')
+
+    @mock.patch('api.cache.is_shared_cache', return_value=True)
+    def test_relation_sets_follow_mutations(self, is_shared_cache):
+        """Флаги пользователя обновляются после изменения его связей."""
+        self.client.get('/api/recipes/')
+        generation = get_user_relations_generation(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                f'/api/recipes/{self.recipes[1].id}/shopping_cart/'
+            )
+            self.assertEqual(
+                get_user_relations_generation(self.user.pk), generation
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        response = self.client.get(f'/api/recipes/{self.recipes[1].id}/')
+        self.assertTrue(response.data['is_in_shopping_cart'])
+        self.assertFalse(response.data['is_favorited'])
+        self.assertTrue(response.data['author']['is_subscribed'])
+        response = self.client.get(f'/api/users/{self.author.id}/')
+        self.assertTrue(response.data['is_subscribed'])
+
+    def test_fragments_keep_caller_context(self):
+        """Сборка фрагментов не меняет переданный контекст."""
+        Subscription.objects.create(user=self.user, author=self.author)
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = self.user
+        context = {'request': request}
+        data = RecipeSerializer(self.recipes[0], context=context).data
+        self.assertTrue(data['author']['is_subscribed'])
+        self.assertEqual(context, {'request': request})
+        self.assertTrue(
+            UserSerializer(self.author, context=context).data['is_subscribed']
+        )
+
+    def test_author_change_refreshes_fragment(self):
+        """Изменение профиля автора обновляет фрагменты его рецептов."""
+        url = f'/api/recipes/{self.recipes[0].id}/'
+        self.client.get(url)
+        self.author.first_name = 'Иван'
+        self.author.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data['author']['first_name'], 'Иван')
+
+
+class SparseFieldsetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        self.guest_client = APIClient()
+        Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=1, image='recipes/images/test.png'
+        )
+
+    def test_recipe_fields_skip_relations(self):
+        """Выбранные поля рецепта не подгружают текст и связи."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(
+                '/api/recipes/?fields=id,name,cooking_time'
+            )
+        self.assertEqual(
+            set(response.data['results'][0]), {'id', 'name', 'cooking_time'}
+        )
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('"text"', sql)
+        self.assertNotIn('recipeingredient', sql)
+
+    def test_user_omit(self):
+        """Параметр omit исключает поля пользователя."""
+        response = self.guest_client.get(
+            f'/api/users/{self.author.id}/?omit=email,avatar'
+        )
+        self.assertNotIn('email', response.data)
+        self.assertEqual(response.data['username'], 'author')
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class FeedTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        self.user = User.objects.create_user(
+            username='reader', email='reader@example.com'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.create(user=self.user, author=self.author)
+
+    def create_recipes(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [
+                Recipe.objects.create(
+                    author=self.author, name=f'Рецепт {number}',
+                    text='Описание', cooking_time=1,
+                    image='recipes/images/test.png'
+                )
+                for number in range(count)
+            ]
+
+    def test_feed_fan_out_and_cursor(self):
+        """Новые рецепты попадают в ленту и листаются курсором."""
+        recipes = self.create_recipes(3)
+        self.assertEqual(FeedEntry.objects.filter(user=self.user).count(), 3)
+        response = self.client.get('/api/recipes/feed/?limit=2')
+        ids = [recipe['id'] for recipe in response.data['results']]
+        response = self.client.get(response.data['next'])
+        ids += [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+        self.assertIsNone(response.data['next'])
+
+    def test_large_author_pulled_on_read(self):
+        """Рецепты крупных авторов читаются без рассылки по лентам."""
+        follower = get_user_model().objects.create_user(
+            username='follower', email='follower@example.com'
+        )
+        with mock.patch('recipes.feed.FEED_FANOUT_LIMIT', 1):
+            with self.captureOnCommitCallbacks(execute=True):
+                subscription = Subscription.objects.create(
+                    user=follower, author=self.author
+                )
+            self.assertTrue(
+                LargeAuthor.objects.filter(author=self.author).exists()
+            )
+            recipes = self.create_recipes(2)
+            self.assertFalse(FeedEntry.objects.exists())
+            response = self.client.get('/api/recipes/feed/')
+            self.assertEqual(
+                [recipe['id'] for recipe in response.data['results']],
+                [recipe.id for recipe in reversed(recipes)]
+            )
+            with self.captureOnCommitCallbacks(execute=True):
+                subscription.delete()
+        self.assertFalse(LargeAuthor.objects.exists())
+        self.assertEqual(
+            set(FeedEntry.objects.filter(user=self.user).values_list(
+                'recipe_id', flat=True
+            )),
+            {recipe.id for recipe in recipes}
+        )
+
+
+class IngredientIndexTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        self.guest_client = APIClient()
+        self.ingredients = [
+            Ingredient.objects.create(name=f'Продукт {number}',
+                                      measurement_unit='г')
+            for number in range(5)
+        ]
+
+    def create_recipe(self, *ingredient_numbers):
+        recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=1, image='recipes/images/test.png'
+        )
+        for number in ingredient_numbers:
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=self.ingredients[number], amount=1
+            )
+        return recipe
+
+    def get_similar_ids(self, recipe):
+        response = self.guest_client.get(f'/api/recipes/{recipe.id}/similar/')
+        return [item['id'] for item in response.data]
+
+    def test_similar_ranked_by_jaccard(self):
+        """Похожие рецепты упорядочены по доле общих ингредиентов."""
+        base = self.create_recipe(0, 1, 2)
+        close = self.create_recipe(0, 1, 2, 3)
+        far = self.create_recipe(0, 4)
+        self.create_recipe(3, 4)
+        rebuild_index()
+        self.assertEqual(self.get_similar_ids(base), [close.id, far.id])
+
+        RecipeIngredient.objects.filter(recipe=far).delete()
+        for number in (0, 1, 2):
+            RecipeIngredient.objects.create(
+                recipe=far, ingredient=self.ingredients[number], amount=1
+            )
+        index_recipe(far.id)
+        self.assertEqual(self.get_similar_ids(base), [far.id, close.id])
+
+    def test_pantry_ranked_by_coverage(self):
+        """Подбор по ингредиентам упорядочен по доле покрытия рецепта."""
+        full = self.create_recipe(0, 1)
+        partial = self.create_recipe(0, 2, 3)
+        self.create_recipe(4)
+        rebuild_index()
+        pantry = f'{self.ingredients[0].id},{self.ingredients[1].id}'
+        response = self.guest_client.get(
+            f'/api/recipes/pantry/?ingredients={pantry}'
+        )
+        self.assertEqual(
+            [item['id'] for item in response.data], [full.id, partial.id]
+        )
+        self.assertEqual(response.data[0]['coverage'], 1)
+        self.assertEqual(
+            {item['id'] for item in response.data[1]['missing_ingredients']},
+            {self.ingredients[2].id, self.ingredients[3].id}
+        )
+
+    def test_index_packs_big_ids(self):
+        """Идентификаторы больше 32 бит упаковываются без потерь."""
+        ids = [1, 2 ** 32, 2 ** 63 - 1]
+        self.assertEqual(list(unpack_ids(pack_ids(reversed(ids)))), ids)
+
+    def test_pantry_uses_indexed_sizes(self):
+        """Доля покрытия берётся из индекса и следует за изменением рецепта."""
+        recipe = self.create_recipe(0, 1)
+        self.create_recipe(0, 2, 3)
+        rebuild_index()
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=self.ingredients[4], amount=1
+        )
+        index_recipe(recipe.id)
+        with self.assertNumQueries(2):
+            matches = match_pantry(
+                [self.ingredients[0].id, self.ingredients[1].id], 10
+            )
+        self.assertEqual(matches[0][:2], (recipe.id, 2 / 3))
+        self.assertEqual(matches[0][2], [self.ingredients[4].id])
+
+
+class RecipeScoresTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        self.users = [
+            User.objects.create_user(
+                username=f'user{number}', email=f'user{number}@example.com'
+            )
+            for number in range(2)
+        ]
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=1, image='recipes/images/test.png'
+            )
+            for number in range(3)
+        ]
+
+    def test_popular_ordering_with_cursor(self):
+        """Сортировка по популярности учитывает события и листается."""
+        for user in self.users:
+            client = APIClient()
+            client.force_authenticate(user=user)
+            client.post(f'/api/recipes/{self.recipes[1].id}/favorite/')
+        client.post(f'/api/recipes/{self.recipes[2].id}/shopping_cart/')
+        update_recipe_scores()
+        guest_client = APIClient()
+        response = guest_client.get('/api/recipes/?ordering=popular&limit=2')
+        ids = [recipe['id'] for recipe in response.data['results']]
+        response = guest_client.get(response.data['next'])
+        ids += [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(
+            ids, [self.recipes[1].id, self.recipes[2].id, self.recipes[0].id]
+        )
+
+    def test_recipe_without_score_is_paginated(self):
+        """Рецепт без строки рейтинга листается как рецепт с нулём."""
+        RecipeScore.objects.filter(recipe=self.recipes[1]).delete()
+        guest_client = APIClient()
+        for ordering in ('popular', 'trending'):
+            with self.subTest(ordering=ordering):
+                response = guest_client.get(
+                    f'/api/recipes/?ordering={ordering}&limit=1'
+                )
+                ids = [recipe['id'] for recipe in response.data['results']]
+                while response.data['next']:
+                    response = guest_client.get(response.data['next'])
+                    ids += [
+                        recipe['id'] for recipe in response.data['results']
+                    ]
+                self.assertEqual(
+                    ids, [recipe.id for recipe in reversed(self.recipes)]
+                )
+
+    def test_malformed_cursor_not_found(self):
+        """Курсор со значениями неверного типа отклоняется с 404."""
+        guest_client = APIClient()
+        for values in (
+            [{'a': 1}, 1], [[1], 1], [1, '1'], [True, 1],
+            [1, 2 ** 64], ['NaN', 1],
+        ):
+            with self.subTest(values=values):
+                cursor = base64.urlsafe_b64encode(
+                    json.dumps(values).encode()
+                ).decode()
+                response = guest_client.get(
+                    f'/api/recipes/?ordering=popular&cursor={cursor}'
+                )
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class ShoppingListTotalsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        self.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com'
+        )
+        self.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.flour, self.milk = (
+            Ingredient.objects.create(name='Мука', measurement_unit='г'),
+            Ingredient.objects.create(name='Молоко', measurement_unit='мл'),
+        )
+        self.recipes = []
+        for amount in (100, 50):
+            recipe = Recipe.objects.create(
+                author=self.author, name='Рецепт', text='Описание',
+                cooking_time=1, image='recipes/images/test.png'
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=self.flour, amount=amount
+            )
+            self.recipes.append(recipe)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(user=self.author)
+
+    def get_totals(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.user
+        ).values_list('ingredient__name', 'amount'))
+
+    def test_totals_follow_cart_and_recipe_changes(self):
+        """Итоги списка покупок меняются вместе с корзиной и рецептами."""
+        for recipe in self.recipes:
+            self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.assertEqual(self.get_totals(), {'Мука': 150})
+
+        self.author_client.patch(
+            f'/api/recipes/{self.recipes[0].id}/',
+            {
+                'ingredients': [
+                    {'id': self.flour.id, 'amount': 20},
+                    {'id': self.milk.id, 'amount': 200},
+                ],
+                'tags': [self.tag.id],
+            },
+            format='json'
+        )
+        self.assertEqual(self.get_totals(), {'Мука': 70, 'Молоко': 200})
+
+        self.client.delete(f'/api/recipes/{self.recipes[1].id}/shopping_cart/')
+        self.assertEqual(self.get_totals(), {'Мука': 20, 'Молоко': 200})
+
+        self.author_client.delete(f'/api/recipes/{self.recipes[0].id}/')
+        self.assertEqual(self.get_totals(), {})
+
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_async_download_returns_job(self):
+        """Фоновая генерация списка покупок доступна через задачу."""
+        self.client.post(f'/api/recipes/{self.recipes[0].id}/shopping_cart/')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(
+                '/api/recipes/download_shopping_cart/',
+                HTTP_PREFER='respond-async'
+            )
+        self.assertEqual(response.status_code, HTTPStatus.ACCEPTED)
+        self.assertEqual(response['Location'], response.data['url'])
+
+        job = self.client.get(response.data['url']).data
+        self.assertEqual(job['status'], 'done')
+        file_name = DocumentJob.objects.get(pk=job['id']).file_name
+        self.addCleanup(os.remove, os.path.join(PDF_DIR, file_name))
+        download = self.client.get(job['download_url'])
+        self.assertEqual(download.status_code, HTTPStatus.OK)
+        self.assertEqual(download['Content-Type'], 'application/pdf')
+        with mock.patch(
+            'api.utils.get_file_delivery',
+            return_value=XAccelRedirectFileDelivery()
+        ):
+            download = self.client.get(job['download_url'])
+        self.assertEqual(
+            download['X-Accel-Redirect'], f'/protected-media/pdf/{file_name}'
+        )
+        self.assertFalse(download.content)
+
+        download = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(download.status_code, HTTPStatus.OK)
+        self.assertTrue(b''.join(download.streaming_content).startswith(
+            b'%PDF'
+        ))
+
+        other = APIClient()
+        other.force_authenticate(user=self.author)
+        self.assertEqual(
+            other.get(response.data['url']).status_code, HTTPStatus.NOT_FOUND
+        )
+
+    def test_admin_cart_is_read_only(self):
+        """Корзина в админ-панели не меняется в обход списка покупок."""
+        self.client.post(f'/api/recipes/{self.recipes[0].id}/shopping_cart/')
+        cart = ShoppingCart.objects.get(user=self.user)
+        admin = get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        self.client.force_login(admin)
+        for url in (
+            '/admin/recipes/shoppingcart/add/',
+            f'/admin/recipes/shoppingcart/{cart.id}/delete/',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.post(url, {'post': 'yes'}).status_code,
+                    HTTPStatus.FORBIDDEN
+                )
+        self.assertTrue(ShoppingCart.objects.filter(pk=cart.pk).exists())
+
+
+class ThrottlingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = APIClient()
+
+    @mock.patch.object(
+        ActionTokenBucketThrottle, 'THROTTLE_RATES',
+        {'ip:recipe.list': '2/min'}
+    )
+    def test_token_bucket_limits_action(self):
+        """Исчерпанная корзина возвращает 429 с заголовком Retry-After."""
+        for _ in range(2):
+            response = self.guest_client.get('/api/recipes/')
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+        response = self.guest_client.get('/api/recipes/')
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+        response = self.guest_client.get('/api/tags/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @mock.patch.object(
+        ActionTokenBucketThrottle, 'THROTTLE_RATES',
+        {'ip:recipe.list': '2/min'}
+    )
+    @mock.patch('api.throttling.THROTTLE_LOCK_ATTEMPTS', 1)
+    def test_locked_bucket_rejects_request(self):
+        """Корзина, которую обновляет другой запрос, не списывается дважды."""
+        cache.add('throttle:ip:recipe.list:127.0.0.1:lock', True)
+        response = self.guest_client.get('/api/recipes/')
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        cache.delete('throttle:ip:recipe.list:127.0.0.1:lock')
+        response = self.guest_client.get('/api/recipes/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_deploy_check_requires_shared_cache(self):
+        """Проверка развёртывания отклоняет кэш в памяти процесса."""
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)], ['api.E001']
+        )
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'cache',
+        }}):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class IdempotencyTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Описание',
+            cooking_time=1, image='recipes/images/test.png'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_record_rechecked_after_lock(self):
+        """Ответ, сохранённый до взятия блокировки, повторяется."""
+        url = f'/api/recipes/{self.recipe.id}/favorite/'
+        first = self.client.post(url, HTTP_IDEMPOTENCY_KEY='key-1')
+        patched = mock.Mock(wraps=cache)
+        patched.get.side_effect = [None, cache.get(
+            f'idempotency:{self.user.pk}:{hashlib.md5(b"key-1").hexdigest()}'
+        )]
+        with mock.patch('api.idempotency.cache', patched):
+            retry = self.client.post(url, HTTP_IDEMPOTENCY_KEY='key-1')
+        self.assertEqual(retry.status_code, HTTPStatus.CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+
+    def test_retry_replays_first_response(self):
+        """Повтор запроса с тем же ключом возвращает первый ответ."""
+        url = f'/api/recipes/{self.recipe.id}/favorite/'
+        first = self.client.post(url, HTTP_IDEMPOTENCY_KEY='key-1')
+        retry = self.client.post(url, HTTP_IDEMPOTENCY_KEY='key-1')
+        self.assertEqual(first.status_code, HTTPStatus.CREATED)
+        self.assertEqual(retry.status_code, HTTPStatus.CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Favorite.objects.count(), 1)
+
+        other = self.client.post(
+            url, {'extra': 1}, format='json', HTTP_IDEMPOTENCY_KEY='key-1'
+        )
+        self.assertEqual(
+            other.status_code, HTTPStatus.UNPROCESSABLE_ENTITY
+        )
+        self.assertEqual(
+            self.client.post(url).status_code, HTTPStatus.BAD_REQUEST
+        )
+
+    def test_retry_replays_client_error(self):
+        """Ошибка клиента, выброшенная исключением, тоже повторяется."""
+        url = f'/api/recipes/{self.recipe.id}/favorite/'
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        first = self.client.post(url, HTTP_IDEMPOTENCY_KEY='key-1')
+        self.assertEqual(first.status_code, HTTPStatus.BAD_REQUEST)
+        Favorite.objects.all().delete()
+        retry = self.client.post(url, HTTP_IDEMPOTENCY_KEY='key-1')
+        self.assertEqual(retry.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertFalse(Favorite.objects.exists())
+
+
+class UserListTestCase(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username='reader', email='reader@example.com'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_authors(self, count):
+        User = get_user_model()
+        start = User.objects.count()
+        for number in range(start, start + count):
+            author = User.objects.create_user(
+                username=f'author{number}', email=f'author{number}@example.com'
+            )
+            Subscription.objects.create(user=self.user, author=author)
+
+    def get_query_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_user_list_is_constant_query(self):
+        """Число запросов списка пользователей не зависит от их числа."""
+        self.create_authors(2)
+        expected = self.get_query_count('/api/users/')
+        self.create_authors(4)
+        self.assertEqual(self.get_query_count('/api/users/'), expected)
+        response = self.client.get('/api/users/')
+        self.assertTrue(all(
+            item['is_subscribed']
+            for item in response.data['results']
+            if item['id'] != self.user.id
+        ))
+
+    def test_user_list_keyset_pagination(self):
+        """Параметр cursor включает пагинацию по ключу."""
+        self.create_authors(3)
+        response = self.client.get('/api/users/?cursor=&limit=2')
+        usernames = [item['username'] for item in response.data['results']]
+        self.assertEqual(usernames, ['author1', 'author2'])
+        self.assertNotIn('count', response.data)
+        response = self.client.get(response.data['next'])
+        usernames = [item['username'] for item in response.data['results']]
+        self.assertEqual(usernames, ['author3', 'reader'])
+
+
+class MediaStorageTestCase(TestCase):
+    image = (
+        'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJ'
+        'AAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+    )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        User = get_user_model()
+        self.clients = []
+        for number in range(2):
+            client = APIClient()
+            client.force_authenticate(user=User.objects.create_user(
+                username=f'user{number}', email=f'user{number}@example.com'
+            ))
+            self.clients.append(client)
+
+    def test_same_content_is_stored_once(self):
+        """Одинаковые файлы хранятся один раз и удаляются без ссылок."""
+        for client in self.clients:
+            response = client.put(
+                '/api/users/me/avatar/', {'avatar': self.image},
+                format='json'
+            )
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+        names = set(get_user_model().objects.values_list(
+            'avatar', flat=True
+        ))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertEqual(MediaFile.objects.get(name=name).references, 2)
+
+        self.clients[0].delete('/api/users/me/avatar/')
+        self.assertEqual(MediaFile.objects.get(name=name).references, 1)
+        self.assertTrue(default_storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.clients[1].delete('/api/users/me/avatar/')
+        self.assertFalse(MediaFile.objects.filter(name=name).exists())
+        self.assertFalse(default_storage.exists(name))
+
+    def test_reacquired_file_is_kept(self):
+        """Удаление файла без ссылок не теряет одновременную загрузку."""
+        self.clients[0].put(
+            '/api/users/me/avatar/', {'avatar': self.image}, format='json'
+        )
+        name = get_user_model().objects.get(username='user0').avatar.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.clients[0].delete('/api/users/me/avatar/')
+        self.assertEqual(MediaFile.objects.get(name=name).references, 0)
+        save = ContentAddressedStorage.save
+
+        def save_and_release(storage, *args, **kwargs):
+            stored_name = save(storage, *args, **kwargs)
+            for callback in callbacks:
+                callback()
+            return stored_name
+
+        with mock.patch.object(
+            ContentAddressedStorage, 'save', save_and_release
+        ):
+            self.clients[1].put(
+                '/api/users/me/avatar/', {'avatar': self.image},
+                format='json'
+            )
+        self.assertEqual(MediaFile.objects.get(name=name).references, 1)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_garbage_collector_removes_orphans(self):
+        """Сборщик удаляет только старые файлы без ссылок."""
+        self.clients[0].put(
+            '/api/users/me/avatar/', {'avatar': self.image}, format='json'
+        )
+        referenced = get_user_model().objects.get(username='user0').avatar
+        orphans = ['recipes/images/a.png', 'recipes/images/b/c.png', 'd.pdf']
+        for name in orphans + [referenced.name]:
+            path = default_storage.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(b'data')
+        fresh = default_storage.save('recipes/images/fresh.png', ContentFile(
+            b'fresh'
+        ))
+
+        self.assertEqual(collect_garbage(), (0, 0))
+        with mock.patch('recipes.media.MEDIA_GC_BATCH_SIZE', 2):
+            self.assertEqual(
+                collect_garbage(grace_period=-1), (len(orphans) + 1, 17)
+            )
+        self.assertTrue(default_storage.exists(referenced.name))
+        self.assertFalse(any(
+            default_storage.exists(name) for name in orphans + [fresh]
+        ))
+
+
+@mock.patch('api.pagination.RECIPE_CHANGES_LAG', -1)
+class RecipeChangesTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = get_user_model().objects.create_user(
+            username='author', email='author@example.com'
+        )
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=1, image='recipes/images/test.png'
+            )
+            for number in range(2)
+        ]
+        self.client = APIClient()
+
+    def get_changes(self, **params):
+        response = self.client.get('/api/recipes/changes/', params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.data
+
+    def test_changes_since_cursor(self):
+        """Журнал изменений отдаёт только изменения после курсора."""
+        first, second = self.recipes
+        page = self.get_changes(limit=1)
+        self.assertEqual(
+            [(item['id'], item['action']) for item in page['results']],
+            [(first.id, 'created')]
+        )
+        self.assertEqual(page['results'][0]['recipe']['name'], 'Рецепт 0')
+        page = self.client.get(page['next']).data
+        self.assertEqual(page['results'][0]['id'], second.id)
+        self.assertIsNone(page['next'])
+
+        first.name = 'Новое название'
+        first.save()
+        second_id = second.id
+        second.delete()
+        page = self.get_changes(since=page['cursor'])
+        self.assertEqual(
+            [(item['id'], item['action']) for item in page['results']],
+            [(first.id, 'updated'), (second_id, 'deleted')]
+        )
+        self.assertEqual(
+            page['results'][0]['recipe']['name'], 'Новое название'
+        )
+        cursor = page['cursor']
+        page = self.get_changes(since=cursor)
+        self.assertEqual((page['results'], page['cursor']), ([], cursor))
+
+    def test_malformed_since_not_found(self):
+        """Курсор since с неверным временем отклоняется с ошибкой 404."""
+        for values in ([123, 1], ['вчера', 1], [None, 1]):
+            since = base64.urlsafe_b64encode(
+                json.dumps(values).encode()
+            ).decode()
+            response = self.client.get(
+                '/api/recipes/changes/', {'since': since}
+            )
+            self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class RecipeTransferTestCase(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        self.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.flour = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Блины', text='Описание',
+            cooking_time=20, image='recipes/images/test.png'
+        )
+        self.recipe.tags.set([self.tag])
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.flour, amount=200
+        )
+        index_recipe(self.recipe.pk)
+
+    def test_export_import_round_trip(self):
+        """Выгруженные рецепты загружаются с новыми связями."""
+        output = io.StringIO()
+        self.assertEqual(export_recipes(output, batch_size=1), 1)
+        lines = output.getvalue().splitlines()
+        lines.append(lines[0].replace('author@example.com', 'new@example.com'))
+        lines.append(lines[0].replace('"Мука", "г"', '"Соль", "г"'))
+
+        self.assertEqual(import_recipes(lines, batch_size=2), (2, 1))
+        copies = Recipe.objects.exclude(pk=self.recipe.pk)
+        self.assertEqual(copies.count(), 2)
+        self.assertEqual(
+            set(copies.values_list('ingredients__name', flat=True)),
+            {'Мука', 'Соль'}
+        )
+        self.assertEqual(Ingredient.objects.count(), 2)
+        for copy in copies:
+            self.assertEqual(list(copy.tags.all()), [self.tag])
+            self.assertEqual(copy.author, self.author)
+        self.assertEqual(
+            set(get_similar_recipe_ids(self.recipe.pk, 5)),
+            {copies.get(ingredients=self.flour).pk}
+        )
+
+        def get_index():
+            return (
+                set(IngredientPosting.objects.values_list(
+                    'ingredient_id', 'recipe_ids', 'recipe_sizes'
+                )),
+                set(RecipeIngredientSet.objects.values_list(
+                    'recipe_id', 'ingredient_ids', 'size'
+                )),
+            )
+
+        imported = get_index()
+        rebuild_index()
+        self.assertEqual(imported, get_index())
+
+    def test_import_matches_tags_by_name(self):
+        """Тег с другим слагом и тем же названием не дублируется."""
+        output = io.StringIO()
+        export_recipes(output)
+        line = output.getvalue().replace('"breakfast"', '"morning"')
+        self.assertEqual(import_recipes([line]), (1, 0))
+        copy = Recipe.objects.exclude(pk=self.recipe.pk).get()
+        self.assertEqual(list(copy.tags.all()), [self.tag])
+        self.assertEqual(Tag.objects.count(), 1)
+
+        with mock.patch.object(Tag.objects, 'bulk_create'):
+            with self.assertRaises(ValueError):
+                import_recipes([line.replace('"Завтрак"', '"Ужин"')])
+        self.assertEqual(Recipe.objects.count(), 2)
+
+
+@override_settings(REPLICA_DATABASES=['replica0', 'replica1'])
+class ReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.connections = mock.MagicMock()
+        patcher = mock.patch('foodgram.routers.connections', self.connections)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.connections.__getitem__.return_value.in_atomic_block = False
+
+    def route(self, method, operations):
+        token = request_routing.set({
+            'use_replicas': method == 'GET', 'replica': None
+        })
+        try:
+            return [
+                getattr(self.router, f'db_for_{operation}')(Recipe)
+                for operation in operations
+            ]
+        finally:
+            request_routing.reset(token)
+
+    def test_reads_follow_method_and_writes(self):
+        """Чтения идут на реплики по кругу до первой записи."""
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+        self.assertEqual(
+            self.route('GET', ['read', 'read', 'write', 'read']),
+            ['replica0', 'replica0', 'default', 'default']
+        )
+        self.assertEqual(self.route('GET', ['read']), ['replica1'])
+        self.assertEqual(self.route('POST', ['read']), ['default'])
+
+    def test_unhealthy_replica_is_ejected(self):
+        """Недоступная реплика исключается из выбора."""
+        replica = self.connections.__getitem__.return_value
+        replica.ensure_connection.side_effect = [OperationalError, None, None]
+        with self.assertLogs('foodgram.routers', 'WARNING'):
+            self.assertEqual(self.route('GET', ['read']), ['replica1'])
+        self.assertEqual(self.router.get_replicas(), ['replica1'])
+        self.assertEqual(self.route('GET', ['read']), ['replica1'])
+
+
+class QueryCountTestCase(TestCase):
+    sizes = (1, 10, 100)
+
+    def setUp(self):
+        catalog_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, catalog_dir)
+        settings_override = override_settings(
+            INGREDIENT_CATALOG_PATH=os.path.join(catalog_dir, 'catalog.bin')
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.seeded = 0
+
+    def create_recipe(self, author, number):
+        recipe = Recipe.objects.create(
+            author=author, name=f'Рецепт {number}', text='Описание',
+            cooking_time=1, image='recipes/images/test.png'
+        )
+        recipe.tags.add(self.tag)
+        RecipeIngredient.objects.create(
+            recipe=recipe, amount=1, ingredient=Ingredient.objects.create(
+                name=f'Продукт {number}', measurement_unit='г'
+            )
+        )
+        return recipe
+
+    def seed_recipes(self, number):
+        recipe = self.create_recipe(self.user, number)
+        Favorite.objects.create(user=self.user, recipe=recipe)
+
+    def seed_subscriptions(self, number):
+        author = get_user_model().objects.create_user(
+            username=f'author{number}', email=f'author{number}@example.com'
+        )
+        for _ in range(2):
+            self.create_recipe(author, number)
+        Subscription.objects.create(user=self.user, author=author)
+
+    def seed_users(self, number):
+        get_user_model().objects.create_user(
+            username=f'user{number}', email=f'user{number}@example.com'
+        )
+
+    def seed_ingredients(self, number):
+        Ingredient.objects.create(name=f'Продукт {number}',
+                                  measurement_unit='г')
+
+    def seed_shopping_cart(self, number):
+        self.client.post(
+            f'/api/recipes/'
+            f'{self.create_recipe(self.user, number).id}/shopping_cart/'
+        )
+
+    def assertQueryCountStable(self, url, seed):
+        """
+        Проверка, что число запросов к эндпоинту не растёт
+        с числом связанных объектов; при расхождении выводится SQL.
+        """
+        baseline = None
+        for size in self.sizes:
+            with self.subTest(url=url, size=size):
+                for number in range(self.seeded, size):
+                    seed(number)
+                self.seeded = size
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                captured = [query['sql'] for query in queries]
+                if baseline is None:
+                    baseline = captured
+                    continue
+                self.assertEqual(
+                    len(captured), len(baseline),
+                    '\n'.join([
+                        f'{url}: {len(baseline)} запросов при '
+                        f'{self.sizes[0]} объектах, {len(captured)} '
+                        f'при {size}.', 'Было:', *baseline,
+                        'Стало:', *captured,
+                    ])
+                )
+
+    def test_recipe_list(self):
+        """Список рецептов."""
+        self.assertQueryCountStable(
+            '/api/recipes/?limit=100', self.seed_recipes
+        )
+
+    def test_subscriptions(self):
+        """Список подписок с рецептами авторов."""
+        self.assertQueryCountStable(
+            '/api/users/subscriptions/?limit=100&recipes_limit=1',
+            self.seed_subscriptions
+        )
+
+    def test_user_list(self):
+        """Список пользователей."""
+        self.assertQueryCountStable('/api/users/?limit=100', self.seed_users)
+
+    def test_ingredients(self):
+        """Список ингредиентов."""
+        self.assertQueryCountStable('/api/ingredients/', self.seed_ingredients)
+
+    def test_download_shopping_cart(self):
+        """Выгрузка списка покупок."""
+        self.assertQueryCountStable(
+            '/api/recipes/download_shopping_cart/', self.seed_shopping_cart
+        )
+
+
+class WorkerStartupTestCase(SimpleTestCase):
+    def test_pdf_machinery_is_not_imported_on_startup(self):
+        """Запуск воркера не загружает reportlab."""
+        modules = [module for module, _, _ in measure_imports()]
+        self.assertIn('api.utils', modules)
+        self.assertNotIn(
+            'reportlab', {module.split('.')[0] for module in modules}
+        )
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class IngredientCatalogTestCase(TestCase):
+    def setUp(self):
+        catalog_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, catalog_dir)
+        settings_override = override_settings(
+            INGREDIENT_CATALOG_PATH=os.path.join(catalog_dir, 'catalog.bin')
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salt, self.sugar, self.brown_sugar = (
+                Ingredient.objects.create(name=name, measurement_unit=unit)
+                for name, unit in (
+                    ('Соль', 'г'), ('Сахар', 'г'),
+                    ('Тростниковый сахар', 'ст. л.')
+                )
+            )
+
+    def test_search_prefers_prefix_matches(self):
+        """Поиск по снимку выдаёт сначала совпадения по началу названия."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/ingredients/?name=сах')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(
+            [item['id'] for item in response.json()],
+            [self.sugar.id, self.brown_sugar.id]
+        )
+        self.assertEqual(response.json()[1]['measurement_unit'], 'ст. л.')
+
+    def test_database_search_matches_snapshot(self):
+        """Поиск по базе без снимка выдаёт тот же ответ, что и снимок."""
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in ('Sugar', 'brown sugar', 'Sugar syrup', 'salt'):
+                Ingredient.objects.create(name=name, measurement_unit='г')
+        queries = ['', 'su', 'SUG', 'gar', 'x']
+        if connection.vendor != 'sqlite':
+            # SQLite сравнивает без учёта регистра только ASCII.
+            queries.append('сах')
+        for query in queries:
+            with self.subTest(query=query):
+                url = f'/api/ingredients/?name={query}'
+                snapshot = self.client.get(url).json()
+                with mock.patch('api.views.catalog.load', return_value=None):
+                    self.assertEqual(self.client.get(url).json(), snapshot)
+
+    def test_snapshot_follows_changes(self):
+        """Снимок пересобирается после изменения и удаления ингредиента."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salt.name = 'Морская соль'
+            self.salt.save()
+        self.assertEqual(
+            self.client.get(f'/api/ingredients/{self.salt.id}/').json(),
+            {'id': self.salt.id, 'name': 'Морская соль',
+             'measurement_unit': 'г'}
+        )
+        salt_id = self.salt.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salt.delete()
+        self.assertEqual(
+            self.client.get(f'/api/ingredients/{salt_id}/').status_code,
+            HTTPStatus.NOT_FOUND
+        )
+
+
+@skipIf(
+    connection.vendor == 'sqlite',
+    'SQLite в памяти не допускает параллельной записи из потоков.'
+)
+class RecipeRelationConcurrencyTestCase(TransactionTestCase):
+    threads = 8
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Описание',
+            cooking_time=1, image='recipes/images/test.png'
+        )
+
+    def request_concurrently(self, method, url):
+        barrier = Barrier(self.threads)
+
+        def send():
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            barrier.wait()
+            try:
+                return getattr(client, method)(url).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.threads) as executor:
+            futures = [executor.submit(send) for _ in range(self.threads)]
+        return sorted(future.result() for future in futures)
+
+    def test_concurrent_toggles_do_not_fail(self):
+        """Одновременные запросы добавляют и удаляют связь один раз."""
+        for url in (
+            f'/api/recipes/{self.recipe.id}/favorite/',
+            f'/api/recipes/{self.recipe.id}/shopping_cart/',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.request_concurrently('post', url),
+                    [HTTPStatus.CREATED]
+                    + [HTTPStatus.BAD_REQUEST] * (self.threads - 1)
+                )
+                self.assertEqual(
+                    self.request_concurrently('delete', url),
+                    [HTTPStatus.NO_CONTENT]
+                    + [HTTPStatus.BAD_REQUEST] * (self.threads - 1)
+                )
+        self.assertFalse(Favorite.objects.exists())
+        self.assertEqual(
+            RecipeActivity.objects.filter(recipe=self.recipe).count(), 4
+        )
+
+    def test_concurrent_first_use_of_ingredient(self):
+        """Одновременная индексация с новым ингредиентом не теряет рецепты."""
+        ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        recipes = [self.recipe] + [
+            Recipe.objects.create(
+                author=self.user, name=f'Рецепт {number}', text='Описание',
+                cooking_time=1, image='recipes/images/test.png'
+            )
+            for number in range(self.threads - 1)
+        ]
+        for recipe in recipes:
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+        IngredientPosting.objects.all().delete()
+        RecipeIngredientSet.objects.all().delete()
+        barrier = Barrier(self.threads)
+
+        def index(recipe_id):
+            barrier.wait()
+            try:
+                index_recipe(recipe_id)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.threads) as executor:
+            for future in [
+                executor.submit(index, recipe.id) for recipe in recipes
+            ]:
+                future.result()
+        self.assertEqual(
+            list(unpack_ids(IngredientPosting.objects.get(
+                ingredient=ingredient
+            ).recipe_ids)),
+            sorted(recipe.id for recipe in recipes)
+        )
@@ -0,0 +1,140 @@
+import time
+
+from rest_framework.throttling import SimpleRateThrottle
+
+from foodgram.constants import (THROTTLE_LOCK_ATTEMPTS, THROTTLE_LOCK_TIMEOUT,
+                                THROTTLE_LOCK_WAIT)
+
+
+class ActionTokenBucketThrottle(SimpleRateThrottle):
+    """
+    Ограничение частоты запросов по алгоритму маркерной корзины
+    с отдельной частотой для каждого действия представления.
+
+    Частота вида 'N/период' задаёт ёмкость корзины в N запросов,
+    которая равномерно восполняется за период. Состояние корзины
+    хранится в кэше одной записью (остаток, время), поэтому проверка
+    не зависит от частоты. Действия без настроенной частоты
+    не ограничиваются.
+
+    Запись обновляется под блокировкой в кэше, поэтому кэш должен
+    быть общим для всех процессов (проверка api.E001 при развёртывании).
+    """
+
+    scope_prefix = None
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def __init__(self):
+        """
+        Частота зависит от действия и определяется при проверке запроса.
+        """
+
+    def get_scope(self, view):
+        """
+        Метод возвращает область ограничения: явно заданную
+        в представлении или собранную из имени набора и действия.
+        """
+
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None:
+            basename = getattr(view, 'basename', None)
+            action = getattr(view, 'action', None)
+            if basename is None or action is None:
+                return None
+            scope = f'{basename}.{action}'
+        return f'{self.scope_prefix}:{scope}'
+
+    def get_ident_for_request(self, request):
+        """
+        Метод возвращает идентификатор клиента для ключа корзины.
+        """
+
+        return self.get_ident(request)
+
+    def get_cache_key(self, request, view):
+        """
+        Метод возвращает ключ корзины клиента в кэше.
+        """
+
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident_for_request(request)
+        }
+
+    def allow_request(self, request, view):
+        """
+        Метод пополняет корзину за прошедшее время и списывает
+        из неё один маркер, если он есть.
+        """
+
+        self.scope = self.get_scope(view)
+        self.rate = self.THROTTLE_RATES.get(self.scope)
+        if self.rate is None:
+            return True
+        capacity, duration = self.parse_rate(self.rate)
+        self.refill_rate = capacity / duration
+        self.key = self.get_cache_key(request, view)
+        lock_key = f'{self.key}:lock'
+        for _ in range(THROTTLE_LOCK_ATTEMPTS):
+            if self.cache.add(lock_key, True, THROTTLE_LOCK_TIMEOUT):
+                break
+            time.sleep(THROTTLE_LOCK_WAIT)
+        else:
+            # Корзину непрерывно обновляют параллельные запросы
+            # того же клиента: запрос отклоняется без ожидания.
+            self.tokens = 0
+            return False
+        try:
+            return self.take_token(capacity, duration)
+        finally:
+            self.cache.delete(lock_key)
+
+    def take_token(self, capacity, duration):
+        """
+        Метод пополняет корзину и списывает маркер; вызывается
+        под блокировкой корзины.
+        """
+
+        self.now = self.timer()
+        tokens, updated_at = self.cache.get(self.key, (capacity, self.now))
+        self.tokens = min(
+            capacity, tokens + (self.now - updated_at) * self.refill_rate
+        )
+        allowed = self.tokens >= 1
+        if allowed:
+            self.tokens -= 1
+        self.cache.set(self.key, (self.tokens, self.now), duration)
+        return allowed
+
+    def wait(self):
+        """
+        Метод возвращает время до появления в корзине целого маркера.
+        """
+
+        return (1 - self.tokens) / self.refill_rate
+
+
+class UserActionThrottle(ActionTokenBucketThrottle):
+    """
+    Ограничение частоты действий для пользователя,
+    анонимные запросы различаются по IP-адресу.
+    """
+
+    scope_prefix = 'user'
+
+    def get_ident_for_request(self, request):
+        """
+        Метод возвращает идентификатор пользователя или IP-адрес.
+        """
+
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return super().get_ident_for_request(request)
+
+
+class IPActionThrottle(ActionTokenBucketThrottle):
+    """
+    Ограничение частоты действий для IP-адреса.
+    """
+
+    scope_prefix = 'ip'
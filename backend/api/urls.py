@@ -1,10 +1,12 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientsViewSet, RecipeViewSet, TagViewSet
+from .views import (DocumentJobViewSet, IngredientsViewSet, RecipeViewSet,
+                    TagViewSet)
 
 router_v1 = DefaultRouter()
 
+router_v1.register('jobs', DocumentJobViewSet, basename='job')
 router_v1.register('ingredients', IngredientsViewSet, basename='ingredient')
 router_v1.register('recipes', RecipeViewSet, basename='recipe')
 router_v1.register('tags', TagViewSet, basename='tag')
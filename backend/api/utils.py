@@ -1,39 +1,56 @@
 import os
-from collections import defaultdict
+from functools import lru_cache
 
+from django.conf import settings
 from django.utils import baseconv
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 
 from foodgram.constants import (BODY_FONT_SIZE, BODY_LINE_SPACING, FONT,
                                 FONT_BOLD, FONT_BOLD_PATH, FONT_PATH, HEADER,
                                 HEADER_FONT_SIZE, HEADER_LINE_SPACING,
                                 MARGIN_X, START_Y)
-from foodgram.settings import PDF_DIR
+from foodgram.delivery import get_file_delivery
 
 
-def generate_shopping_cart_pdf(recipes, user):
+def generate_shopping_cart_pdf(items, user, file_name=None):
     """
     Метод генерирует PDF-файл с списком ингредиентов для корзины покупок.
     """
 
-    ingredients_dict = defaultdict(float)
+    file_name = file_name or get_shopping_cart_file_name(user)
+    os.makedirs(settings.PDF_DIR, exist_ok=True)
+    render_shopping_cart_pdf(
+        items, os.path.join(settings.PDF_DIR, file_name)
+    )
+    return file_name
+
 
-    for recipe in recipes:
-        recipe_ingredients = recipe.recipe_ingredients.all()
-        for recipe_ingredient in recipe_ingredients:
-            ingredient = recipe_ingredient.ingredient
-            ingredients_dict[ingredient] += recipe_ingredient.amount
+@lru_cache(maxsize=None)
+def register_fonts():
+    """
+    Метод регистрирует шрифты PDF один раз на процесс: разбор
+    TTF-файлов дорог, а реестр reportlab общий для всех документов.
+    """
 
-    file_name = f'Корзина_пользователя_{user.username}.pdf'
-    file_path = os.path.join(PDF_DIR, file_name)
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
 
-    pdf_canvas = canvas.Canvas(file_path, pagesize=letter)
     pdfmetrics.registerFont(TTFont(FONT, FONT_PATH))
     pdfmetrics.registerFont(TTFont(FONT_BOLD, FONT_BOLD_PATH))
 
+
+def render_shopping_cart_pdf(items, output):
+    """
+    Метод рисует список ингредиентов в PDF по пути или в файловый объект.
+
+    Reportlab загружается при первой генерации, а не при старте воркера.
+    """
+
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    register_fonts()
+    pdf_canvas = canvas.Canvas(output, pagesize=letter)
+
     pdf_canvas.setFont(FONT_BOLD, HEADER_FONT_SIZE)
     y = START_Y
     pdf_canvas.drawString(
@@ -43,17 +60,24 @@ def generate_shopping_cart_pdf(recipes, user):
 
     pdf_canvas.setFont(FONT, BODY_FONT_SIZE)
     serial_number = 0
-    for ingredient, amount in ingredients_dict.items():
+    for item in items:
         serial_number += 1
         pdf_canvas.drawString(
             MARGIN_X, y,
-            f'{serial_number}. {ingredient.name}: '
-            f'{amount} {ingredient.measurement_unit}'
+            f'{serial_number}. {item.ingredient.name}: '
+            f'{item.amount} {item.ingredient.measurement_unit}'
         )
         y -= BODY_LINE_SPACING
 
     pdf_canvas.save()
-    return file_name
+
+
+def get_shopping_cart_file_name(user):
+    """
+    Метод возвращает имя файла списка покупок для пользователя.
+    """
+
+    return f'Корзина_пользователя_{user.username}.pdf'
 
 
 def generate_short_link(recipe_id):
@@ -63,3 +87,14 @@ def generate_short_link(recipe_id):
 
     short_string = baseconv.base62.encode(recipe_id)
     return short_string
+
+
+def get_pdf_response(file_name, download_name):
+    """
+    Метод возвращает PDF файл из каталога документов как вложение.
+    """
+
+    return get_file_delivery().file_response(
+        os.path.join(settings.PDF_DIR, file_name), download_name,
+        'application/pdf'
+    )
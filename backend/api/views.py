@@ -1,6 +1,9 @@
-import os
+import io
 
-from django.http import FileResponse
+from django.conf import settings
+from django.db.models import Count, F, Value
+from django.db.models.functions import Coalesce
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.utils import baseconv
@@ -10,15 +13,31 @@ from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from foodgram.settings import PDF_DIR
-from recipes.models import Ingredient, Recipe, Tag
+from foodgram.constants import MAX_PAGE_SIZE, RECIPE_SUGGESTIONS_LIMIT
+from foodgram.delivery import get_file_delivery
+from recipes.catalog import catalog
+from recipes.ingredient_index import get_similar_recipe_ids, match_pantry
+from recipes.models import DocumentJob, Ingredient, Recipe, Tag
 
+from .cache import (get_or_build_recipe_list, get_or_build_tag_facets,
+                    get_user_relations_generation, is_shared_cache)
+from .documents import enqueue_shopping_cart_job, get_shopping_list_items
 from .filters import IngredientFilter, RecipeFilter
+from .idempotency import idempotent
+from .pagination import (FeedPagination, KeysetPagination,
+                         RecipeChangesPagination)
 from .permissions import IsOwnerOrReadOnly
-from .serializers import (FavoriteSerializer, IngredientSerializer,
+from .serializers import (DocumentJobSerializer, FavoriteSerializer,
+                          IngredientSerializer, PantrySerializer,
                           RecipeCreateUpdateSerializer, RecipeSerializer,
                           ShoppingCartSerializer, TagSerializer)
-from .utils import generate_shopping_cart_pdf, generate_short_link
+from .utils import (generate_short_link, get_pdf_response,
+                    get_shopping_cart_file_name, render_shopping_cart_pdf)
+
+RECIPE_ORDERINGS = {
+    'popular': ('-popularity', '-id', ),
+    'trending': ('-trending', '-id', ),
+}
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -34,6 +53,46 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        """
+        Метод возвращает набор рецептов; для выдачи загружаются
+        только поля версии, остальное берётся из кэша фрагментов.
+        """
+
+        if self.action not in ('list', 'retrieve', 'similar'):
+            return self.queryset
+        queryset = self.queryset.only('id', 'updated_at')
+        if self.get_ordering():
+            queryset = queryset.annotate(
+                # Рецепт без строки рейтинга не должен давать NULL
+                # в ключе курсора.
+                popularity=Coalesce(F('score__popularity'), Value(0)),
+                trending=Coalesce(F('score__trending'), Value(0.0)),
+            )
+        return queryset
+
+    def get_ordering(self):
+        """
+        Метод возвращает сортировку по рейтингу из параметра ordering.
+        """
+
+        return RECIPE_ORDERINGS.get(self.request.query_params.get('ordering'))
+
+    @property
+    def paginator(self):
+        """
+        Пагинатор списка; при сортировке по рейтингу используется
+        пагинация по ключу.
+        """
+
+        if not hasattr(self, '_paginator'):
+            ordering = self.get_ordering()
+            if ordering is None or self.action != 'list':
+                return super().paginator
+            self._paginator = KeysetPagination()
+            self._paginator.ordering = ordering
+        return self._paginator
+
     def get_serializer_class(self):
         """
         Метод возвращает соответствующий класс сериализатора
@@ -54,6 +113,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         от действия и метода запроса.
         """
 
+        if self.action in ['feed', 'download_shopping_cart']:
+            return [permissions.IsAuthenticated()]
         if self.request.method in permissions.SAFE_METHODS:
             return [permissions.AllowAny()]
         if self.action in ['favorite', 'shopping_cart']:
@@ -64,6 +125,86 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return [IsOwnerOrReadOnly()]
         return [permissions.AllowAny()]
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        """
+        Метод создаёт рецепт; повтор запроса с тем же
+        ключом идемпотентности возвращает первый ответ.
+        """
+
+        return super().create(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Метод возвращает список рецептов, для анонимных
+        пользователей ответ берётся из общего кэша.
+        """
+
+        if request.user.is_authenticated:
+            data = super().list(request, *args, **kwargs).data
+        else:
+            data = get_or_build_recipe_list(
+                request, lambda: super(RecipeViewSet, self).list(
+                    request, *args, **kwargs
+                ).data
+            )
+        if 'tags' in request.query_params.get('facets', '').split(','):
+            data = {**data, 'facets': {'tags': self.get_tag_facets(request)}}
+        return Response(data)
+
+    def get_tag_facets(self, request):
+        """
+        Метод возвращает число рецептов по слагам тегов для текущих
+        фильтров без учёта фильтра по тегам одним запросом GROUP BY.
+
+        Результат кэшируется по набору фильтров; фильтры по избранному
+        и корзине добавляют в ключ поколение связей пользователя
+        и кэшируются только в общем для процессов кэше.
+        """
+
+        params = request.query_params.copy()
+        params.pop('tags', None)
+        user = request.user
+
+        def build():
+            recipes = RecipeFilter(
+                params, queryset=Recipe.objects.all(), request=request
+            ).qs
+            return dict(
+                Recipe.tags.through.objects.filter(
+                    recipe__in=recipes.values('pk')
+                ).values_list('tag__slug').annotate(
+                    count=Count('recipe_id')
+                ).order_by()
+            )
+
+        signature = [
+            (name, params.get(name))
+            for name in ('author', 'is_favorited', 'is_in_shopping_cart')
+        ]
+        if user.is_authenticated and (
+            'is_favorited' in params or 'is_in_shopping_cart' in params
+        ):
+            if not is_shared_cache():
+                return build()
+            signature.append(
+                (user.pk, get_user_relations_generation(user.pk))
+            )
+        return get_or_build_tag_facets(signature, build)
+
+    def get_limit(self, request):
+        """
+        Метод возвращает ограничение на число рецептов в подборке.
+        """
+
+        try:
+            limit = int(request.query_params.get(
+                'limit', RECIPE_SUGGESTIONS_LIMIT
+            ))
+        except ValueError:
+            limit = RECIPE_SUGGESTIONS_LIMIT
+        return max(1, min(limit, MAX_PAGE_SIZE))
+
     def perform_create(self, serializer):
         """
         Метод сохраняет рецепт с указанием
@@ -72,6 +213,116 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         serializer.save(author=self.request.user)
 
+    @action(
+        detail=False, methods=['get'], url_path='feed'
+    )
+    def feed(self, request):
+        """
+        Метод возвращает ленту последних рецептов авторов,
+        на которых подписан текущий пользователь.
+        """
+
+        paginator = FeedPagination()
+        recipes = paginator.paginate_feed(request.user, request)
+        serializer = RecipeSerializer(
+            recipes, many=True, context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False, methods=['get'], url_path='changes'
+    )
+    def changes(self, request):
+        """
+        Метод возвращает созданные, изменённые и удалённые рецепты
+        после курсора since для синхронизации клиентов.
+        """
+
+        paginator = RecipeChangesPagination()
+        changes = paginator.paginate_changes(
+            Recipe.objects.only('id', 'created_at', 'updated_at'), request
+        )
+        since = paginator.get_since()
+        recipes = [recipe for recipe, _ in changes if recipe is not None]
+        serializer = RecipeSerializer(
+            recipes, many=True, context=self.get_serializer_context()
+        )
+        payloads = iter(serializer.data)
+        results = []
+        for recipe, recipe_id in changes:
+            if recipe is None:
+                results.append({'id': recipe_id, 'action': 'deleted'})
+                continue
+            created = since is None or recipe.created_at > since
+            results.append({
+                'id': recipe_id,
+                'action': 'created' if created else 'updated',
+                'recipe': next(payloads),
+            })
+        return paginator.get_paginated_response(results)
+
+    @action(
+        detail=True, methods=['get'], url_path='similar'
+    )
+    def similar(self, request, pk=None):
+        """
+        Метод возвращает рецепты, наиболее похожие
+        на данный по набору ингредиентов.
+        """
+
+        recipe = self.get_object()
+        recipe_ids = get_similar_recipe_ids(
+            recipe.pk, self.get_limit(request)
+        )
+        recipes = Recipe.objects.only('id', 'updated_at').in_bulk(recipe_ids)
+        serializer = RecipeSerializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes],
+            many=True,
+            context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+    @action(
+        detail=False, methods=['get'], url_path='pantry'
+    )
+    def pantry(self, request):
+        """
+        Метод подбирает рецепты по имеющимся у пользователя ингредиентам
+        и для каждого возвращает долю покрытия и недостающие ингредиенты.
+        """
+
+        ingredient_ids = [
+            value
+            for param in request.query_params.getlist('ingredients')
+            for value in param.split(',') if value
+        ]
+        pantry = PantrySerializer(data={'ingredients': ingredient_ids})
+        pantry.is_valid(raise_exception=True)
+        matches = match_pantry(
+            pantry.validated_data['ingredients'], self.get_limit(request)
+        )
+        recipes = Recipe.objects.only('id', 'updated_at').in_bulk(
+            [recipe_id for recipe_id, _, _ in matches]
+        )
+        missing = Ingredient.objects.in_bulk({
+            ingredient_id
+            for _, _, missing_ids in matches
+            for ingredient_id in missing_ids
+        })
+        matches = [match for match in matches if match[0] in recipes]
+        data = RecipeSerializer(
+            [recipes[recipe_id] for recipe_id, _, _ in matches],
+            many=True,
+            context=self.get_serializer_context()
+        ).data
+        for item, (_, coverage, missing_ids) in zip(data, matches):
+            item['coverage'] = round(coverage, 4)
+            item['missing_ingredients'] = IngredientSerializer(
+                [missing[pk] for pk in missing_ids if pk in missing],
+                many=True
+            ).data
+        return Response(data)
+
     @action(
         detail=True, methods=['get'], url_path='get-link'
     )
@@ -90,6 +341,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(
         detail=True, methods=['post', 'delete'], url_path='favorite'
     )
+    @idempotent
     def favorite(self, request, pk=None):
         """
         Метод добавляет или удаляет рецепт из
@@ -120,6 +372,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(
         detail=True, methods=['post', 'delete'], url_path='shopping_cart'
     )
+    @idempotent
     def shopping_cart(self, request, pk=None):
         """
         Метод добавляет или удаляет рецепт из
@@ -154,19 +407,64 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """
         Метод генерирует PDF файл со списком покупок
         для текущего пользователя и возвращает его.
+
+        При включённой фоновой генерации или заголовке
+        Prefer: respond-async ставит задачу в очередь и возвращает
+        202 со ссылкой для опроса её статуса.
         """
 
         user = request.user
-        recipes = Recipe.objects.filter(in_shopping_carts__user=user)
+        prefer = request.headers.get('Prefer', '')
+        if settings.DOCUMENT_JOBS_ASYNC or 'respond-async' in prefer:
+            job = enqueue_shopping_cart_job(user)
+            serializer = DocumentJobSerializer(
+                job, context={'request': request}
+            )
+            return Response(
+                serializer.data,
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Location': serializer.data['url']}
+            )
 
-        file_name = generate_shopping_cart_pdf(recipes, user)
-        file_path = os.path.join(PDF_DIR, file_name)
-        response = FileResponse(
-            open(file_path, 'rb'),
-            content_type='application/pdf'
+        output = io.BytesIO()
+        render_shopping_cart_pdf(get_shopping_list_items(user), output)
+        return get_file_delivery().content_response(
+            output.getvalue(), get_shopping_cart_file_name(user),
+            'application/pdf'
+        )
+
+
+class DocumentJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Класс представления для опроса статуса задач генерации
+    документов текущего пользователя и получения результата.
+    """
+
+    serializer_class = DocumentJobSerializer
+    permission_classes = (permissions.IsAuthenticated, )
+
+    def get_queryset(self):
+        """
+        Метод возвращает задачи текущего пользователя.
+        """
+
+        return DocumentJob.objects.filter(user=self.request.user)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """
+        Метод возвращает готовый документ задачи.
+        """
+
+        job = self.get_object()
+        if job.status != DocumentJob.DONE:
+            return Response(
+                {'detail': 'Документ ещё не готов.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return get_pdf_response(
+            job.file_name, get_shopping_cart_file_name(job.user)
         )
-        response['Content-Disposition'] = f'attachment; filename="{file_name}"'
-        return response
 
 
 class ShortLinkRedirectView(RedirectView):
@@ -212,3 +510,29 @@ class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend, )
     pagination_class = None
     filterset_class = IngredientFilter
+    lookup_value_regex = r'\d+'
+
+    def list(self, request, *args, **kwargs):
+        """
+        Метод возвращает ингредиенты из снимка каталога в памяти,
+        без снимка — из базы данных.
+        """
+
+        snapshot = catalog.load()
+        if snapshot is None:
+            return super().list(request, *args, **kwargs)
+        return Response(snapshot.search(request.query_params.get('name', '')))
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Метод возвращает ингредиент из снимка каталога в памяти,
+        без снимка — из базы данных.
+        """
+
+        snapshot = catalog.load()
+        if snapshot is None:
+            return super().retrieve(request, *args, **kwargs)
+        ingredient = snapshot.get(int(kwargs[self.lookup_field]))
+        if ingredient is None:
+            raise Http404
+        return Response(ingredient)
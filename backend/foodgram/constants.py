@@ -5,6 +5,9 @@ MAX_INGREDIENT_NAME = 128
 MAX_INGREDIENT_M_U = 64
 MAX_RECIPE_NAME = 256
 MIN_VALIDATOR_VALUE = 1
+MAX_ACTIVITY_KIND = 16
+MAX_JOB_STATUS = 16
+MAX_FILE_NAME = 255
 FONT = 'DejaVu'
 FONT_PATH = 'fonts/DejaVuSans.ttf'
 FONT_BOLD = 'DejaVu-Bold'
@@ -16,3 +19,33 @@ HEADER_LINE_SPACING = 30
 BODY_LINE_SPACING = 20
 HEADER = 'Список ингредиентов:'
 MARGIN_X = 100
+RECIPE_LIST_CACHE_FRESH = 30
+RECIPE_LIST_CACHE_TIMEOUT = 60 * 10
+RECIPE_LIST_CACHE_LOCK_TIMEOUT = 10
+RECIPE_FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+USER_RELATIONS_CACHE_TIMEOUT = 60 * 5
+MAX_PAGE_SIZE = 100
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_SIZE = 50
+FEED_BATCH_SIZE = 500
+RECIPE_SUGGESTIONS_LIMIT = 6
+SIMILAR_RECIPES_CANDIDATES = 500
+INGREDIENT_INDEX_BATCH_SIZE = 1000
+PANTRY_MAX_INGREDIENTS = 200
+TRENDING_HALF_LIFE = 60 * 60 * 24 * 3
+RECIPE_SCORES_BATCH_SIZE = 1000
+SHOPPING_LIST_BATCH_SIZE = 1000
+DOCUMENT_JOB_STALE_AFTER = 60 * 10
+THROTTLE_LOCK_TIMEOUT = 1
+THROTTLE_LOCK_ATTEMPTS = 20
+THROTTLE_LOCK_WAIT = 0.005
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+MAX_IDEMPOTENCY_KEY = 255
+MEDIA_GC_GRACE_PERIOD = 60 * 60
+MEDIA_GC_BATCH_SIZE = 1000
+DOCUMENT_JOB_RETENTION = 60 * 60 * 24
+REPLICA_EJECT_TIMEOUT = 30
+RECIPE_CHANGES_LAG = 5
+RECIPE_TRANSFER_BATCH_SIZE = 1000
+BINARY_COLLATIONS = {'postgresql': 'C', 'sqlite': 'BINARY'}
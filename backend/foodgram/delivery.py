@@ -0,0 +1,87 @@
+import io
+import os
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.module_loading import import_string
+
+
+def get_content_disposition(download_name):
+    """
+    Метод возвращает заголовок Content-Disposition для вложения,
+    имя не в ASCII кодируется по RFC 5987.
+    """
+
+    try:
+        download_name.encode('ascii')
+    except UnicodeEncodeError:
+        return f"attachment; filename*=utf-8''{quote(download_name)}"
+    return f'attachment; filename="{download_name}"'
+
+
+class StreamingFileDelivery:
+    """
+    Доставка файлов потоковой передачей из процесса приложения.
+    """
+
+    def file_response(self, path, download_name, content_type):
+        """
+        Метод возвращает ответ с файлом с диска.
+        """
+
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Content-Disposition'] = get_content_disposition(
+            download_name
+        )
+        return response
+
+    def content_response(self, content, download_name, content_type):
+        """
+        Метод возвращает ответ с содержимым из памяти.
+        """
+
+        response = FileResponse(
+            io.BytesIO(content), content_type=content_type
+        )
+        response['Content-Disposition'] = get_content_disposition(
+            download_name
+        )
+        return response
+
+
+class XAccelRedirectFileDelivery(StreamingFileDelivery):
+    """
+    Доставка файлов из каталога медиа через внутренний location
+    nginx по заголовку X-Accel-Redirect: приложение только проверяет
+    доступ, а передачу файла выполняет nginx.
+    """
+
+    def file_response(self, path, download_name, content_type):
+        """
+        Метод возвращает ответ с перенаправлением на внутренний
+        location; файлы вне каталога медиа передаются потоком.
+        """
+
+        relative = os.path.relpath(path, settings.MEDIA_ROOT)
+        if relative.startswith(os.pardir) or os.path.isabs(relative):
+            return super().file_response(path, download_name, content_type)
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (
+            settings.X_ACCEL_REDIRECT_LOCATION
+            + quote(relative.replace(os.sep, '/'))
+        )
+        response['Content-Disposition'] = get_content_disposition(
+            download_name
+        )
+        return response
+
+
+@lru_cache(maxsize=None)
+def get_file_delivery():
+    """
+    Метод возвращает настроенный способ доставки файлов.
+    """
+
+    return import_string(settings.FILE_DELIVERY_BACKEND)()
@@ -0,0 +1,116 @@
+import logging
+import time
+from contextvars import ContextVar
+from itertools import count
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .constants import REPLICA_EJECT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Состояние маршрутизации текущего запроса: разрешено ли чтение
+# с реплик (запрещается первой записью) и какая реплика выбрана.
+request_routing = ContextVar('request_routing', default=None)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Middleware, разрешающий чтение с реплик на время
+    обработки запросов безопасными методами.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request_routing.set({
+            'use_replicas': request.method in SAFE_METHODS,
+            'replica': None,
+        })
+        try:
+            return self.get_response(request)
+        finally:
+            request_routing.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Маршрутизатор, направляющий чтения безопасных запросов на реплики.
+
+    Реплика выбирается по кругу из доступных при первом чтении запроса
+    и сохраняется до его конца. Недоступная реплика исключается на
+    REPLICA_EJECT_TIMEOUT секунд. После первой записи и внутри
+    транзакций запрос читает только из основной базы.
+    """
+
+    def __init__(self):
+        self.counter = count()
+        self.ejected_until = {}
+
+    def get_replicas(self):
+        """
+        Метод возвращает реплики, не исключённые по состоянию.
+        """
+
+        now = time.monotonic()
+        return [
+            alias for alias in settings.REPLICA_DATABASES
+            if self.ejected_until.get(alias, 0) <= now
+        ]
+
+    def is_healthy(self, alias):
+        """
+        Метод проверяет соединение с репликой и исключает её при ошибке.
+        """
+
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            logger.warning('Реплика %s недоступна', alias, exc_info=True)
+            self.ejected_until[alias] = (
+                time.monotonic() + REPLICA_EJECT_TIMEOUT
+            )
+            return False
+        return True
+
+    def choose_replica(self):
+        """
+        Метод выбирает следующую доступную реплику по кругу.
+        """
+
+        replicas = self.get_replicas()
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        start = next(self.counter)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if self.is_healthy(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_read(self, model, **hints):
+        state = request_routing.get()
+        if (
+            state is None
+            or not state['use_replicas']
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        if state['replica'] is None:
+            state['replica'] = self.choose_replica()
+        return state['replica']
+
+    def db_for_write(self, model, **hints):
+        state = request_routing.get()
+        if state is not None:
+            state['use_replicas'] = False
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -83,6 +83,56 @@ else:
         }
     }
 
+# Реплики для чтения: пути к файлам SQLite или хосты PostgreSQL
+# через запятую; остальные параметры берутся из основной базы.
+REPLICA_DATABASES = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DATABASE_REPLICAS', '').split(','))
+):
+    alias = f'replica{number}'
+    location = 'NAME' if 'sqlite3' in DATABASES['default']['ENGINE'] else 'HOST'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        location: replica.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+if REPLICA_DATABASES:
+    DATABASE_ROUTERS = ['foodgram.routers.ReplicaRouter']
+    MIDDLEWARE.insert(0, 'foodgram.routers.ReplicaRoutingMiddleware')
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
+BACKGROUND_TASK_POOLS = {
+    'default': int(os.getenv('BACKGROUND_TASKS_WORKERS', 2)),
+    'documents': int(os.getenv('DOCUMENT_JOBS_WORKERS', 2)),
+}
+BACKGROUND_TASKS_EAGER = (
+    os.getenv('BACKGROUND_TASKS_EAGER', 'False').lower() == 'true'
+)
+
+DOCUMENT_JOBS_ASYNC = (
+    os.getenv('DOCUMENT_JOBS_ASYNC', 'False').lower() == 'true'
+)
+
+PERIODIC_TASKS = {
+    'recipes.scores.update_recipe_scores': int(
+        os.getenv('RECIPE_SCORES_INTERVAL', 60)
+    ),
+    'api.documents.process_stale_jobs': int(
+        os.getenv('DOCUMENT_JOBS_RECOVERY_INTERVAL', 60)
+    ),
+    'recipes.media.collect_garbage': int(os.getenv('MEDIA_GC_INTERVAL', 0)),
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -116,10 +166,19 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+DEFAULT_FILE_STORAGE = 'foodgram.storage.ContentAddressedStorage'
+
+FILE_DELIVERY_BACKEND = os.getenv(
+    'FILE_DELIVERY_BACKEND', 'foodgram.delivery.StreamingFileDelivery'
+)
+X_ACCEL_REDIRECT_LOCATION = '/protected-media/'
+
 PDF_DIR = os.path.join(MEDIA_ROOT, 'pdf')
 
-if not os.path.exists(PDF_DIR):
-    os.makedirs(PDF_DIR)
+INGREDIENT_CATALOG_PATH = os.getenv(
+    'INGREDIENT_CATALOG_PATH',
+    os.path.join(BASE_DIR, 'catalog', 'ingredients.bin')
+)
 
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -135,6 +194,24 @@ REST_FRAMEWORK = {
 
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageNumberWithLimitPagination',
     'PAGE_SIZE': 6,
+
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.UserActionThrottle',
+        'api.throttling.IPActionThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'user:recipe.download_shopping_cart': os.getenv('THROTTLE_DOCUMENT_RATE', '10/min'),
+        'ip:recipe.download_shopping_cart': os.getenv('THROTTLE_DOCUMENT_IP_RATE', '30/min'),
+        'user:recipe.create': os.getenv('THROTTLE_RECIPE_WRITE_RATE', '20/min'),
+        'user:recipe.update': os.getenv('THROTTLE_RECIPE_WRITE_RATE', '20/min'),
+        'user:recipe.partial_update': os.getenv('THROTTLE_RECIPE_WRITE_RATE', '20/min'),
+        'ip:recipe.create': os.getenv('THROTTLE_RECIPE_WRITE_IP_RATE', '60/min'),
+        'ip:recipe.list': os.getenv('THROTTLE_RECIPE_LIST_IP_RATE', '300/min'),
+        'ip:recipe.similar': os.getenv('THROTTLE_SEARCH_IP_RATE', '120/min'),
+        'ip:recipe.pantry': os.getenv('THROTTLE_SEARCH_IP_RATE', '120/min'),
+        'ip:user.create': os.getenv('THROTTLE_SIGNUP_IP_RATE', '20/hour'),
+    },
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
 }
 
 DJOSER = {
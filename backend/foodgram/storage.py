@@ -0,0 +1,43 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, именующее файлы по хешу содержимого.
+
+    Файл с тем же содержимым в том же каталоге уже существует
+    под тем же именем, поэтому повторная загрузка не пишет на диск.
+    """
+
+    def get_content_name(self, name, content):
+        """
+        Метод возвращает имя файла по SHA-256 содержимого
+        с сохранением каталога и расширения исходного имени.
+        """
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory, file_name = os.path.split(name)
+        extension = os.path.splitext(file_name)[1].lower()
+        return os.path.join(directory, digest[:2], f'{digest}{extension}')
+
+    def save(self, name, content, max_length=None):
+        """
+        Метод сохраняет файл, если файла с таким содержимым ещё нет.
+        """
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
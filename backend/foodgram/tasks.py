@@ -0,0 +1,96 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(pool='default'):
+    """
+    Метод возвращает пул фоновых потоков процесса; размер пула
+    задаётся настройкой BACKGROUND_TASK_POOLS.
+    """
+
+    if pool not in _executors:
+        with _executors_lock:
+            if pool not in _executors:
+                _executors[pool] = ThreadPoolExecutor(
+                    max_workers=settings.BACKGROUND_TASK_POOLS[pool],
+                    thread_name_prefix=f'foodgram-{pool}'
+                )
+    return _executors[pool]
+
+
+def run_task(func, *args, **kwargs):
+    """
+    Метод выполняет задачу и закрывает соединения потока с базой.
+    """
+
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Ошибка фоновой задачи %s', func.__name__)
+    finally:
+        connections.close_all()
+
+
+def run_in_pool(pool, func, *args, **kwargs):
+    """
+    Метод ставит задачу в указанный фоновый пул после фиксации транзакции.
+
+    При BACKGROUND_TASKS_EAGER задача выполняется синхронно.
+    """
+
+    def submit():
+        if settings.BACKGROUND_TASKS_EAGER:
+            func(*args, **kwargs)
+        else:
+            get_executor(pool).submit(run_task, func, *args, **kwargs)
+
+    transaction.on_commit(submit)
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Метод ставит задачу в общий фоновый пул после фиксации транзакции.
+    """
+
+    run_in_pool('default', func, *args, **kwargs)
+
+
+def start_periodic_task(func, interval):
+    """
+    Метод запускает поток-демон, выполняющий задачу раз в interval секунд.
+
+    Первый запуск сдвинут на случайную долю интервала, чтобы
+    воркеры одного сервера не выполняли задачу одновременно.
+    """
+
+    def loop():
+        time.sleep(random.uniform(0, interval))
+        while True:
+            run_task(func)
+            time.sleep(interval)
+
+    threading.Thread(
+        target=loop, name=f'foodgram-periodic-{func.__name__}', daemon=True
+    ).start()
+
+
+def start_periodic_tasks():
+    """
+    Метод запускает периодические задачи из настройки PERIODIC_TASKS.
+    """
+
+    for path, interval in settings.PERIODIC_TASKS.items():
+        if interval > 0:
+            start_periodic_task(import_string(path), interval)
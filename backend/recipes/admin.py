@@ -2,6 +2,8 @@ from django.contrib import admin
 
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                      ShoppingCart, Subscription, Tag)
+from .shopping_list import get_recipe_amounts
+from .signals import recipe_ingredients_changed
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -36,6 +38,18 @@ class RecipeAdmin(admin.ModelAdmin):
 
     get_favorites_count.short_description = 'Рецепт в избранном, кол-во'
 
+    def save_related(self, request, form, formsets, change):
+        """
+        Метод сохраняет связанные объекты рецепта и сообщает
+        об изменении его ингредиентов.
+        """
+
+        previous = get_recipe_amounts(form.instance)
+        super().save_related(request, form, formsets, change)
+        recipe_ingredients_changed.send(
+            sender=Recipe, recipe=form.instance, previous=previous
+        )
+
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -57,6 +71,27 @@ class TagAdmin(admin.ModelAdmin):
     search_fields = ('name', 'slug')
 
 
+@admin.register(ShoppingCart)
+class ShoppingCartAdmin(admin.ModelAdmin):
+    """
+    Админ-панель для просмотра корзин покупок.
+
+    Корзина меняется только через API: вместе с ней пересчитываются
+    суммы списка покупок, поэтому в админ-панели она только для чтения.
+    """
+
+    list_display = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 admin.site.register(Favorite)
-admin.site.register(ShoppingCart)
 admin.site.register(Subscription)
@@ -0,0 +1,245 @@
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+
+from foodgram.tasks import run_in_background
+
+from .models import Ingredient
+
+# Формат снимка (little-endian): заголовок, записи по возрастанию id,
+# индекс записей по названию в нижнем регистре и блок строк UTF-8.
+MAGIC = b'FGIC'
+HEADER = struct.Struct('<4sII')
+RECORD = struct.Struct('<7I')
+INDEX_ITEM = struct.Struct('<I')
+
+build_lock = threading.Lock()
+pending_lock = threading.Lock()
+rebuild_pending = False
+
+
+def write_catalog(path, rows):
+    """
+    Метод записывает снимок каталога ингредиентов атомарно:
+    во временный файл рядом с целевым с последующей заменой.
+    """
+
+    records, strings = [], bytearray()
+
+    def add_string(value):
+        offset = len(strings)
+        data = value.encode()
+        strings.extend(data)
+        return offset, len(data)
+
+    for ingredient_id, name, unit in rows:
+        records.append((
+            ingredient_id, *add_string(name), *add_string(unit),
+            *add_string(name.lower())
+        ))
+    records.sort()
+    index = sorted(
+        range(len(records)),
+        key=lambda position: bytes(strings[
+            records[position][5]:records[position][5] + records[position][6]
+        ])
+    )
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, len(records), len(strings)))
+            for record in records:
+                file.write(RECORD.pack(*record))
+            for position in index:
+                file.write(INDEX_ITEM.pack(position))
+            file.write(strings)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def rebuild_catalog():
+    """
+    Метод пересобирает снимок каталога по таблице ингредиентов.
+    """
+
+    write_catalog(
+        settings.INGREDIENT_CATALOG_PATH,
+        Ingredient.objects.order_by().values_list(
+            'id', 'name', 'measurement_unit'
+        ).iterator()
+    )
+
+
+def refresh_catalog():
+    """
+    Метод пересобирает снимок после фиксации изменений ингредиентов.
+
+    Если пересборка уже ждёт очереди, изменение войдёт в неё:
+    флаг снимается перед чтением таблицы, поэтому серия изменений
+    даёт одну пересборку, а поздние изменения не теряются.
+    """
+
+    global rebuild_pending
+    with pending_lock:
+        if rebuild_pending:
+            return
+        rebuild_pending = True
+    with build_lock:
+        with pending_lock:
+            rebuild_pending = False
+        rebuild_catalog()
+
+
+class IngredientCatalog:
+    """
+    Каталог ингредиентов, отображённый в память только для чтения.
+
+    Снимок разделяется всеми процессами через страничный кэш ОС,
+    поиск выполняется по срезам отображения без копирования.
+    При замене файла снимок отображается заново при следующем обращении.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.key = None
+        self.snapshot = None
+
+    def load(self):
+        """
+        Метод возвращает отображение актуального снимка или None,
+        если снимок ещё не создан; создание ставится в очередь.
+        """
+
+        path = settings.INGREDIENT_CATALOG_PATH
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            run_in_background(refresh_catalog)
+            return None
+        key = (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if key != self.key:
+                with open(path, 'rb') as file:
+                    data = mmap.mmap(
+                        file.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+                magic, count, _ = HEADER.unpack_from(data)
+                if magic != MAGIC:
+                    return None
+                self.key = key
+                self.snapshot = CatalogSnapshot(memoryview(data), count)
+            return self.snapshot
+
+
+class CatalogSnapshot:
+    """
+    Разбор снимка каталога поверх отображения в память.
+    """
+
+    def __init__(self, data, count):
+        self.data = data
+        self.count = count
+        self.records_start = HEADER.size
+        self.index_start = self.records_start + count * RECORD.size
+        self.strings_start = self.index_start + count * INDEX_ITEM.size
+
+    def record(self, position):
+        return RECORD.unpack_from(
+            self.data, self.records_start + position * RECORD.size
+        )
+
+    def string(self, offset, length):
+        start = self.strings_start + offset
+        return self.data[start:start + length]
+
+    def key(self, index_position):
+        (position, ) = INDEX_ITEM.unpack_from(
+            self.data, self.index_start + index_position * INDEX_ITEM.size
+        )
+        return position, self.string(*self.record(position)[5:7])
+
+    def to_dict(self, position):
+        ingredient_id, name_offset, name_length, unit_offset, unit_length = (
+            self.record(position)[:5]
+        )
+        return {
+            'id': ingredient_id,
+            'name': str(self.string(name_offset, name_length), 'utf-8'),
+            'measurement_unit': str(
+                self.string(unit_offset, unit_length), 'utf-8'
+            ),
+        }
+
+    def get(self, ingredient_id):
+        """
+        Метод ищет ингредиент двоичным поиском по идентификатору.
+        """
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.record(middle)[0] < ingredient_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self.record(low)[0] == ingredient_id:
+            return self.to_dict(low)
+        return None
+
+    def search(self, query=''):
+        """
+        Метод возвращает ингредиенты, название которых начинается
+        с запроса (двоичный поиск по индексу), а затем содержащие
+        его в середине названия; регистр не учитывается. Внутри групп
+        порядок индекса: название в нижнем регистре, затем id,
+        как в IngredientFilter для поиска по базе.
+        """
+
+        query = query.lower().encode()
+        keys = KeyView(self)
+        start = bisect_left(keys, query)
+        prefixed = []
+        for index_position in range(start, self.count):
+            position, key = self.key(index_position)
+            if not key.tobytes().startswith(query):
+                break
+            prefixed.append(position)
+        if not query:
+            return [self.to_dict(position) for position in prefixed]
+        contained = [
+            position
+            for position, key in map(self.key, range(self.count))
+            if query in key.tobytes() and not key.tobytes().startswith(query)
+        ]
+        return [self.to_dict(position) for position in prefixed + contained]
+
+
+class KeyView:
+    """
+    Последовательность ключей индекса для двоичного поиска.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __len__(self):
+        return self.snapshot.count
+
+    def __getitem__(self, index_position):
+        return self.snapshot.key(index_position)[1].tobytes()
+
+
+catalog = IngredientCatalog()
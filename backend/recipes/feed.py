@@ -0,0 +1,149 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from foodgram.constants import (FEED_BACKFILL_SIZE, FEED_BATCH_SIZE,
+                                FEED_FANOUT_LIMIT)
+
+from .models import FeedEntry, LargeAuthor, Recipe, Subscription
+
+User = get_user_model()
+
+
+def has_too_many_followers(author_id):
+    """
+    Метод проверяет по подпискам, что у автора слишком много
+    подписчиков для рассылки рецептов по лентам.
+    """
+
+    return Subscription.objects.filter(
+        author_id=author_id
+    )[:FEED_FANOUT_LIMIT + 1].count() > FEED_FANOUT_LIMIT
+
+
+def is_large_author(author_id):
+    """
+    Метод проверяет сохранённую отметку крупного автора.
+    """
+
+    return LargeAuthor.objects.filter(author_id=author_id).exists()
+
+
+def get_pulled_author_ids(user):
+    """
+    Метод возвращает авторов из подписок пользователя, рецепты
+    которых читаются напрямую, а не из ленты.
+    """
+
+    return list(LargeAuthor.objects.filter(
+        author__in=Subscription.objects.filter(user=user).values('author')
+    ).values_list('author_id', flat=True))
+
+
+def update_large_author(author_id):
+    """
+    Метод обновляет отметку крупного автора после изменения подписок.
+
+    Изменения одного автора выполняются по очереди под блокировкой
+    его строки. После снятия отметки ленты подписчиков заполняются
+    его рецептами, которые не рассылались, пока отметка стояла;
+    заполнение идёт после фиксации, чтобы рецепт, сохранённый
+    одновременно со снятием отметки, попал в ленты хотя бы одним путём.
+    """
+
+    with transaction.atomic():
+        if not User.objects.select_for_update().filter(pk=author_id).exists():
+            return
+        large = has_too_many_followers(author_id)
+        if large:
+            LargeAuthor.objects.get_or_create(author_id=author_id)
+            return
+        cleared = LargeAuthor.objects.filter(author_id=author_id).delete()[0]
+    if cleared:
+        backfill_followers(author_id)
+
+
+def backfill_followers(author_id):
+    """
+    Метод добавляет последние рецепты автора в ленты всех подписчиков.
+    """
+
+    recipes = list(Recipe.objects.filter(author_id=author_id).values_list(
+        'id', 'created_at'
+    ).order_by('-created_at')[:FEED_BACKFILL_SIZE])
+    followers = Subscription.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                created_at=created_at,
+            )
+            for user_id in followers.iterator()
+            for recipe_id, created_at in recipes
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def fan_out_recipe(recipe_id):
+    """
+    Метод добавляет новый рецепт в ленты подписчиков автора.
+    """
+
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'id', 'author_id', 'created_at'
+    ).first()
+    if recipe is None or is_large_author(recipe.author_id):
+        return
+    followers = Subscription.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe.pk,
+                author_id=recipe.author_id,
+                created_at=recipe.created_at,
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def add_author_to_feed(user_id, author_id):
+    """
+    Метод заполняет ленту последними рецептами нового автора из подписок.
+    """
+
+    if is_large_author(author_id):
+        return
+    recipes = Recipe.objects.filter(author_id=author_id).values_list(
+        'id', 'created_at'
+    ).order_by('-created_at')[:FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                created_at=created_at,
+            )
+            for recipe_id, created_at in recipes
+        ],
+        ignore_conflicts=True
+    )
+
+
+def remove_author_from_feed(user_id, author_id):
+    """
+    Метод удаляет из ленты рецепты автора после отписки.
+    """
+
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
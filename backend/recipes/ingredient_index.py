@@ -0,0 +1,307 @@
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from heapq import merge, nsmallest
+
+from django.db import transaction
+
+from foodgram.constants import (INGREDIENT_INDEX_BATCH_SIZE,
+                                SIMILAR_RECIPES_CANDIDATES)
+
+from .models import IngredientPosting, RecipeIngredient, RecipeIngredientSet
+
+
+def pack_ids(ids):
+    """
+    Метод упаковывает идентификаторы в отсортированный
+    массив 64-битных целых little-endian.
+    """
+
+    return pack_values(sorted(ids))
+
+
+def pack_values(values):
+    """
+    Метод упаковывает числа в массив 64-битных целых
+    little-endian без изменения порядка: идентификаторы
+    моделей с BigAutoField не помещаются в 32 бита.
+    """
+
+    packed = array('Q', values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_ids(data):
+    """
+    Метод распаковывает массив идентификаторов.
+    """
+
+    unpacked = array('Q')
+    unpacked.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        unpacked.byteswap()
+    return unpacked
+
+
+@transaction.atomic
+def index_recipe(recipe_id):
+    """
+    Метод приводит индекс в соответствие с текущими
+    ингредиентами рецепта; удалённый рецепт убирается из индекса.
+
+    Недостающие строки индекса сначала вставляются пустыми с пропуском
+    конфликтов, затем все строки блокируются и объединяются: при
+    одновременном первом использовании ингредиента вторая транзакция
+    дождётся первой и дополнит её список, а не упадёт на вставке.
+    """
+
+    current = set(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('ingredient_id', flat=True))
+    if current:
+        RecipeIngredientSet.objects.bulk_create(
+            [RecipeIngredientSet(
+                recipe_id=recipe_id, ingredient_ids=b'', size=0
+            )],
+            ignore_conflicts=True
+        )
+    entry = RecipeIngredientSet.objects.select_for_update().filter(
+        recipe_id=recipe_id
+    ).first()
+    previous = set(unpack_ids(entry.ingredient_ids)) if entry else set()
+    added = current - previous
+    removed = previous - current
+
+    if not added and not removed:
+        return
+    IngredientPosting.objects.bulk_create(
+        (
+            IngredientPosting(
+                ingredient_id=ingredient_id, recipe_ids=b'', recipe_sizes=b''
+            )
+            for ingredient_id in sorted(added)
+        ),
+        ignore_conflicts=True
+    )
+    # Размер рецепта хранится во всех его списках, поэтому при
+    # изменении набора обновляются списки всех его ингредиентов.
+    postings = IngredientPosting.objects.select_for_update().order_by(
+        'pk'
+    ).in_bulk(current | removed)
+    changed, emptied = [], []
+    for ingredient_id, posting in postings.items():
+        recipe_ids = unpack_ids(posting.recipe_ids)
+        sizes = unpack_ids(posting.recipe_sizes)
+        position = bisect_left(recipe_ids, recipe_id)
+        present = (
+            position < len(recipe_ids) and recipe_ids[position] == recipe_id
+        )
+        if ingredient_id in current and present:
+            sizes[position] = len(current)
+        elif ingredient_id in current:
+            recipe_ids.insert(position, recipe_id)
+            sizes.insert(position, len(current))
+        elif present:
+            del recipe_ids[position]
+            del sizes[position]
+        if recipe_ids:
+            posting.recipe_ids = pack_values(recipe_ids)
+            posting.recipe_sizes = pack_values(sizes)
+            changed.append(posting)
+        else:
+            emptied.append(ingredient_id)
+    IngredientPosting.objects.bulk_update(
+        changed, ['recipe_ids', 'recipe_sizes']
+    )
+    IngredientPosting.objects.filter(ingredient_id__in=emptied).delete()
+
+    if not current:
+        RecipeIngredientSet.objects.filter(recipe_id=recipe_id).delete()
+    else:
+        RecipeIngredientSet.objects.filter(recipe_id=recipe_id).update(
+            ingredient_ids=pack_ids(current), size=len(current)
+        )
+
+
+@transaction.atomic
+def index_new_recipes(recipe_ingredients):
+    """
+    Метод добавляет в индекс пачку ещё не проиндексированных рецептов
+    по словарю рецепт -> идентификаторы ингредиентов.
+
+    Каждый список обратного индекса читается и записывается один раз
+    на пачку, а не для каждого рецепта отдельно.
+    """
+
+    recipe_sets = {
+        recipe_id: set(ingredient_ids)
+        for recipe_id, ingredient_ids in recipe_ingredients.items()
+        if ingredient_ids
+    }
+    additions = defaultdict(list)
+    for recipe_id in sorted(recipe_sets):
+        for ingredient_id in recipe_sets[recipe_id]:
+            additions[ingredient_id].append(
+                (recipe_id, len(recipe_sets[recipe_id]))
+            )
+    RecipeIngredientSet.objects.bulk_create(
+        (
+            RecipeIngredientSet(
+                recipe_id=recipe_id,
+                ingredient_ids=pack_ids(ingredient_ids),
+                size=len(ingredient_ids)
+            )
+            for recipe_id, ingredient_ids in recipe_sets.items()
+        ),
+        batch_size=INGREDIENT_INDEX_BATCH_SIZE
+    )
+    IngredientPosting.objects.bulk_create(
+        (
+            IngredientPosting(
+                ingredient_id=ingredient_id, recipe_ids=b'', recipe_sizes=b''
+            )
+            for ingredient_id in sorted(additions)
+        ),
+        batch_size=INGREDIENT_INDEX_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    postings = IngredientPosting.objects.select_for_update().order_by(
+        'pk'
+    ).in_bulk(list(additions))
+    for ingredient_id, posting in postings.items():
+        merged = list(merge(
+            zip(
+                unpack_ids(posting.recipe_ids),
+                unpack_ids(posting.recipe_sizes)
+            ),
+            additions[ingredient_id]
+        ))
+        posting.recipe_ids = pack_values(recipe_id for recipe_id, _ in merged)
+        posting.recipe_sizes = pack_values(size for _, size in merged)
+    IngredientPosting.objects.bulk_update(
+        postings.values(), ['recipe_ids', 'recipe_sizes'],
+        batch_size=INGREDIENT_INDEX_BATCH_SIZE
+    )
+
+
+@transaction.atomic
+def rebuild_index():
+    """
+    Метод полностью перестраивает индекс по таблице ингредиентов рецептов.
+    """
+
+    recipe_sets = defaultdict(list)
+    postings = defaultdict(list)
+    rows = RecipeIngredient.objects.values_list(
+        'recipe_id', 'ingredient_id'
+    ).order_by().iterator(chunk_size=INGREDIENT_INDEX_BATCH_SIZE)
+    for recipe_id, ingredient_id in rows:
+        recipe_sets[recipe_id].append(ingredient_id)
+        postings[ingredient_id].append(recipe_id)
+
+    for recipe_ids in postings.values():
+        recipe_ids.sort()
+    RecipeIngredientSet.objects.all().delete()
+    IngredientPosting.objects.all().delete()
+    RecipeIngredientSet.objects.bulk_create(
+        (
+            RecipeIngredientSet(
+                recipe_id=recipe_id,
+                ingredient_ids=pack_ids(ingredient_ids),
+                size=len(ingredient_ids)
+            )
+            for recipe_id, ingredient_ids in recipe_sets.items()
+        ),
+        batch_size=INGREDIENT_INDEX_BATCH_SIZE
+    )
+    IngredientPosting.objects.bulk_create(
+        (
+            IngredientPosting(
+                ingredient_id=ingredient_id,
+                recipe_ids=pack_values(recipe_ids),
+                recipe_sizes=pack_values(
+                    len(recipe_sets[recipe_id]) for recipe_id in recipe_ids
+                )
+            )
+            for ingredient_id, recipe_ids in postings.items()
+        ),
+        batch_size=INGREDIENT_INDEX_BATCH_SIZE
+    )
+    return len(recipe_sets), len(postings)
+
+
+def count_overlaps(ingredient_ids):
+    """
+    Метод считает для каждого рецепта число общих ингредиентов
+    с заданным набором по спискам обратного индекса и возвращает
+    его вместе с количеством ингредиентов рецептов из тех же списков.
+    """
+
+    overlaps, sizes = Counter(), {}
+    postings = IngredientPosting.objects.filter(
+        ingredient_id__in=list(ingredient_ids)
+    ).values_list('recipe_ids', 'recipe_sizes')
+    for recipe_ids, recipe_sizes in postings:
+        recipe_ids = unpack_ids(recipe_ids)
+        overlaps.update(recipe_ids)
+        sizes.update(zip(recipe_ids, unpack_ids(recipe_sizes)))
+    return overlaps, sizes
+
+
+def get_similar_recipe_ids(recipe_id, limit):
+    """
+    Метод возвращает рецепты с наибольшим коэффициентом Жаккара
+    по ингредиентам относительно заданного рецепта.
+    """
+
+    entry = RecipeIngredientSet.objects.filter(recipe_id=recipe_id).first()
+    if entry is None:
+        return []
+    overlaps, sizes = count_overlaps(unpack_ids(entry.ingredient_ids))
+    overlaps.pop(recipe_id, None)
+    scores = {
+        candidate_id: overlap / (entry.size + sizes[candidate_id] - overlap)
+        for candidate_id, overlap in overlaps.most_common(
+            SIMILAR_RECIPES_CANDIDATES
+        )
+    }
+    return nsmallest(
+        limit, scores,
+        key=lambda candidate_id: (-scores[candidate_id], candidate_id)
+    )
+
+
+def match_pantry(ingredient_ids, limit):
+    """
+    Метод подбирает рецепты по имеющимся ингредиентам.
+
+    Рецепты упорядочены по доле имеющихся ингредиентов, для каждого
+    возвращается список недостающих. Доля считается по размерам
+    из обратного индекса, из базы читаются только наборы лучших рецептов.
+    """
+
+    pantry = set(ingredient_ids)
+    overlaps, sizes = count_overlaps(pantry)
+    best = nsmallest(
+        limit, overlaps,
+        key=lambda recipe_id: (
+            -overlaps[recipe_id] / sizes[recipe_id], -overlaps[recipe_id],
+            recipe_id
+        )
+    )
+    sets = RecipeIngredientSet.objects.in_bulk(best)
+    return [
+        (
+            recipe_id,
+            overlaps[recipe_id] / sizes[recipe_id],
+            [
+                ingredient_id
+                for ingredient_id in unpack_ids(sets[recipe_id].ingredient_ids)
+                if ingredient_id not in pantry
+            ]
+        )
+        for recipe_id in best if recipe_id in sets
+    ]
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.catalog import rebuild_catalog
+
+
+class Command(BaseCommand):
+    help = 'Команда для пересборки снимка каталога ингредиентов'
+
+    def handle(self, *args, **options):
+        rebuild_catalog()
+        self.stdout.write(self.style.SUCCESS(
+            f'Снимок каталога записан в {settings.INGREDIENT_CATALOG_PATH}.'
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from foodgram.constants import MEDIA_GC_GRACE_PERIOD
+from recipes.media import collect_garbage
+
+
+class Command(BaseCommand):
+    help = 'Команда для удаления файлов медиа, на которые нет ссылок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-period', type=int, default=MEDIA_GC_GRACE_PERIOD,
+            help='Не удалять файлы моложе указанного числа секунд'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только подсчитать файлы без удаления'
+        )
+
+    def handle(self, *args, **options):
+        files, reclaimed = collect_garbage(
+            options['grace_period'], options['dry_run']
+        )
+        action = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов без ссылок: {files}, '
+            f'освобождено байт: {reclaimed}.'
+        ))
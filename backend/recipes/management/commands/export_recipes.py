@@ -0,0 +1,40 @@
+import sys
+import tarfile
+
+from django.core.management.base import BaseCommand
+
+from recipes.transfer import export_recipes
+
+
+class Command(BaseCommand):
+    help = 'Команда для выгрузки рецептов в формате JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки, по умолчанию стандартный вывод'
+        )
+        parser.add_argument(
+            '--media',
+            help='Архив tar.gz для изображений рецептов'
+        )
+
+    def handle(self, *args, **options):
+        output = (
+            sys.stdout if options['output'] == '-'
+            else open(options['output'], 'w', encoding='utf-8')
+        )
+        media = (
+            tarfile.open(options['media'], 'w|gz') if options['media']
+            else None
+        )
+        try:
+            exported = export_recipes(output, media)
+        finally:
+            if media is not None:
+                media.close()
+            if output is not sys.stdout:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено рецептов: {exported}.'
+        ))
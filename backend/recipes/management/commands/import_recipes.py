@@ -0,0 +1,53 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.transfer import extract_media, import_recipes
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Команда для загрузки рецептов из формата JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', nargs='?', default='-',
+            help='Файл выгрузки, по умолчанию стандартный ввод'
+        )
+        parser.add_argument(
+            '--media',
+            help='Архив с изображениями рецептов'
+        )
+        parser.add_argument(
+            '--default-author',
+            help='Email автора для рецептов неизвестных пользователей'
+        )
+
+    def handle(self, *args, **options):
+        default_author = None
+        if options['default_author']:
+            default_author = User.objects.filter(
+                email=options['default_author']
+            ).first()
+            if default_author is None:
+                raise CommandError('Автор по умолчанию не найден.')
+        if options['media']:
+            with open(options['media'], 'rb') as archive:
+                extract_media(archive)
+        source = (
+            sys.stdin if options['input'] == '-'
+            else open(options['input'], encoding='utf-8')
+        )
+        try:
+            imported, skipped = import_recipes(source, default_author)
+        except ValueError as error:
+            raise CommandError(str(error))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {imported}, '
+            f'пропущено без автора: {skipped}.'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.ingredient_index import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Команда для полной перестройки обратного индекса ингредиентов'
+
+    def handle(self, *args, **options):
+        recipes_count, ingredients_count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс перестроен: рецептов {recipes_count}, '
+            f'ингредиентов {ingredients_count}.'
+        ))
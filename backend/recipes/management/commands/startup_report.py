@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Код, повторяющий запуск воркера: загрузка WSGI-приложения
+# и схемы URL, которую Django импортирует при первом запросе.
+STARTUP_CODE = (
+    'from foodgram.wsgi import application\n'
+    'from django.urls import get_resolver\n'
+    'get_resolver().url_patterns\n'
+)
+
+
+def measure_imports(code=STARTUP_CODE):
+    """
+    Метод выполняет код в отдельном интерпретаторе с -X importtime
+    и возвращает список (модуль, собственное время, общее время)
+    в микросекундах в порядке завершения импорта.
+    """
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, cwd=settings.BASE_DIR,
+        env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'},
+        check=True
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, module = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            continue
+        imports.append((module.strip(), int(own), int(cumulative)))
+    return imports
+
+
+class Command(BaseCommand):
+    help = 'Команда для вывода времени импорта модулей при запуске воркера'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Число пакетов и модулей в отчёте'
+        )
+
+    def handle(self, *args, **options):
+        imports = measure_imports()
+        packages = {}
+        for module, own, _ in imports:
+            package = module.split('.')[0]
+            packages[package] = packages.get(package, 0) + own
+        total = sum(packages.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт при запуске: {total / 1000:.1f} мс, '
+            f'модулей: {len(imports)}.'
+        ))
+        self.stdout.write(self.style.SQL_KEYWORD('Пакеты:'))
+        for package, own in sorted(
+            packages.items(), key=lambda item: item[1], reverse=True
+        )[:options['limit']]:
+            self.stdout.write(f'{own / 1000:10.1f} мс  {package}')
+        self.stdout.write(self.style.SQL_KEYWORD('Модули (с зависимостями):'))
+        for module, _, cumulative in sorted(
+            imports, key=lambda item: item[2], reverse=True
+        )[:options['limit']]:
+            self.stdout.write(f'{cumulative / 1000:10.1f} мс  {module}')
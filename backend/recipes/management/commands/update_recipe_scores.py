@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipes.scores import update_recipe_scores
+
+
+class Command(BaseCommand):
+    help = 'Команда для пересчёта рейтингов рецептов по новым событиям'
+
+    def handle(self, *args, **options):
+        processed = update_recipe_scores()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинги обновлены, обработано событий: {processed}.'
+        ))
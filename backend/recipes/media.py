@@ -0,0 +1,274 @@
+import os
+import time
+from datetime import timedelta
+from heapq import merge
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Collate
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from foodgram.constants import (BINARY_COLLATIONS, DOCUMENT_JOB_RETENTION,
+                                MEDIA_GC_BATCH_SIZE, MEDIA_GC_GRACE_PERIOD)
+
+from .models import DocumentJob, MediaFile, Recipe
+
+User = get_user_model()
+
+
+def acquire_file(name):
+    """
+    Метод увеличивает число ссылок на файл.
+
+    Если строку счётчика одновременно удаляет освобождение файла,
+    обновление дождётся его фиксации и не найдёт строку: тогда
+    строка создаётся заново, а файл будет записан при сохранении.
+    """
+
+    if not name:
+        return
+    updated = 0
+    while not updated:
+        MediaFile.objects.bulk_create(
+            [MediaFile(name=name)], ignore_conflicts=True
+        )
+        updated = MediaFile.objects.filter(name=name).update(
+            references=F('references') + 1
+        )
+
+
+def release_file(name, storage=default_storage):
+    """
+    Метод уменьшает число ссылок на файл; файл без ссылок
+    удаляется из хранилища после фиксации транзакции.
+    """
+
+    if not name:
+        return
+    MediaFile.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1
+    )
+    if MediaFile.objects.filter(name=name, references=0).exists():
+        transaction.on_commit(lambda: delete_unreferenced_file(name, storage))
+
+
+@transaction.atomic
+def delete_unreferenced_file(name, storage=default_storage):
+    """
+    Метод удаляет файл, если на него так и не появилось новых ссылок.
+
+    Строка счётчика без ссылок блокируется на время удаления файла:
+    одновременное получение ссылки на то же имя ждёт фиксации
+    и затем записывает файл заново.
+    """
+
+    if MediaFile.objects.select_for_update().filter(
+        name=name, references=0
+    ).exists():
+        storage.delete(name)
+        MediaFile.objects.filter(name=name).delete()
+
+
+def get_stored_name(instance, field_name):
+    """
+    Метод возвращает имя, под которым файл поля будет сохранён.
+
+    Для ещё не записанного файла имя известно заранее только
+    в хранилище с именами по содержимому, иначе возвращается None.
+    """
+
+    file = getattr(instance, field_name)
+    if not file or file._committed:
+        return file.name or None
+    if not hasattr(file.storage, 'get_content_name'):
+        return None
+    return file.storage.get_content_name(
+        file.field.generate_filename(instance, file.name), file
+    )
+
+
+def track_file_references(model, field_name):
+    """
+    Метод подключает учёт ссылок на файлы поля модели.
+
+    Ссылка на новый файл берётся до его записи в хранилище, чтобы
+    одновременное освобождение того же файла не удалило его.
+    """
+
+    def remember_previous_file(sender, instance, update_fields=None,
+                               **kwargs):
+        instance._previous_files = getattr(instance, '_previous_files', {})
+        instance._acquired_files = getattr(instance, '_acquired_files', {})
+        if (
+            field_name in instance.get_deferred_fields()
+            or (update_fields is not None and field_name not in update_fields)
+        ):
+            instance._previous_files.pop(field_name, None)
+            return
+        previous = (
+            model.objects.filter(pk=instance.pk).values_list(
+                field_name, flat=True
+            ).first()
+            if instance.pk else None
+        )
+        instance._previous_files[field_name] = previous
+        acquired = get_stored_name(instance, field_name)
+        if acquired == previous:
+            acquired = None
+        acquire_file(acquired)
+        instance._acquired_files[field_name] = acquired
+
+    def update_references(sender, instance, **kwargs):
+        previous_files = getattr(instance, '_previous_files', {})
+        if field_name not in previous_files:
+            return
+        previous = previous_files.pop(field_name)
+        acquired = instance._acquired_files.pop(field_name)
+        file = getattr(instance, field_name)
+        current = file.name
+        if acquired != current:
+            if current != previous:
+                acquire_file(current)
+            release_file(acquired, file.storage)
+        if previous != current:
+            release_file(previous, file.storage)
+
+    def release_references(sender, instance, **kwargs):
+        if field_name in instance.get_deferred_fields():
+            return
+        file = getattr(instance, field_name)
+        release_file(file.name, file.storage)
+
+    uid = f'{model._meta.label}.{field_name}'
+    pre_save.connect(
+        remember_previous_file, sender=model, weak=False,
+        dispatch_uid=f'{uid}:remember'
+    )
+    post_save.connect(
+        update_references, sender=model, weak=False,
+        dispatch_uid=f'{uid}:update'
+    )
+    post_delete.connect(
+        release_references, sender=model, weak=False,
+        dispatch_uid=f'{uid}:release'
+    )
+
+
+def iter_media_files(root, prefix=''):
+    """
+    Метод обходит дерево медиа и возвращает пути файлов
+    относительно корня в порядке сравнения строк.
+
+    Каталог сортируется как имя с завершающим разделителем,
+    поэтому порядок обхода совпадает с порядком полных путей,
+    а в памяти хранится только содержимое текущих каталогов.
+    """
+
+    try:
+        entries = list(os.scandir(os.path.join(root, prefix)))
+    except FileNotFoundError:
+        return
+    entries.sort(
+        key=lambda entry: entry.name + ('/' if entry.is_dir() else '')
+    )
+    for entry in entries:
+        name = f'{prefix}{entry.name}'
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_media_files(root, f'{name}/')
+        elif entry.is_file(follow_symlinks=False):
+            yield name, entry.stat()
+
+
+def iter_column_values(queryset, field_name, prefix=''):
+    """
+    Метод возвращает непустые значения столбца в порядке
+    побайтового сравнения строк.
+    """
+
+    collation = BINARY_COLLATIONS[connection.vendor]
+    values = queryset.exclude(**{field_name: ''}).exclude(
+        **{f'{field_name}__isnull': True}
+    ).order_by(Collate(field_name, collation)).values_list(
+        field_name, flat=True
+    ).iterator(chunk_size=MEDIA_GC_BATCH_SIZE)
+    for value in values:
+        yield f'{prefix}{value}'
+
+
+def iter_referenced_files():
+    """
+    Метод возвращает отсортированный поток имён файлов,
+    на которые ссылаются записи базы.
+    """
+
+    pdf_prefix = os.path.relpath(settings.PDF_DIR, settings.MEDIA_ROOT)
+    return merge(
+        iter_column_values(Recipe.objects.all(), 'image'),
+        iter_column_values(User.objects.all(), 'avatar'),
+        iter_column_values(
+            DocumentJob.objects.all(), 'file_name', f'{pdf_prefix}/'
+        ),
+    )
+
+
+def iter_orphaned_files(root, grace_period):
+    """
+    Метод сравнивает отсортированные потоки файлов и ссылок
+    и возвращает файлы без ссылок старше заданного срока.
+    """
+
+    deadline = time.time() - grace_period
+    referenced = iter_referenced_files()
+    reference = next(referenced, None)
+    for name, stat in iter_media_files(root):
+        while reference is not None and reference < name:
+            reference = next(referenced, None)
+        if name != reference and stat.st_mtime < deadline:
+            yield name, stat.st_size
+
+
+def delete_files(root, names):
+    """
+    Метод удаляет файлы и их счётчики ссылок.
+    """
+
+    for name in names:
+        try:
+            os.remove(os.path.join(root, name))
+        except FileNotFoundError:
+            pass
+    MediaFile.objects.filter(name__in=names).delete()
+
+
+def collect_garbage(grace_period=MEDIA_GC_GRACE_PERIOD, dry_run=False):
+    """
+    Метод удаляет устаревшие задачи генерации документов и файлы медиа,
+    на которые нет ссылок; возвращает число файлов и освобождённых байт.
+    """
+
+    if not dry_run:
+        DocumentJob.objects.filter(
+            created_at__lt=timezone.now() - timedelta(
+                seconds=DOCUMENT_JOB_RETENTION
+            )
+        ).exclude(
+            status__in=(DocumentJob.PENDING, DocumentJob.RUNNING)
+        ).delete()
+
+    root = settings.MEDIA_ROOT
+    files, reclaimed, batch = 0, 0, []
+    for name, size in iter_orphaned_files(root, grace_period):
+        files += 1
+        reclaimed += size
+        batch.append(name)
+        if len(batch) >= MEDIA_GC_BATCH_SIZE:
+            if not dry_run:
+                delete_files(root, batch)
+            batch = []
+    if batch and not dry_run:
+        delete_files(root, batch)
+    return files, reclaimed
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientPosting',
+            fields=[
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='posting', serialize=False, to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('recipe_ids', models.BinaryField(verbose_name='Рецепты')),
+            ],
+            options={
+                'verbose_name': 'Список рецептов ингредиента',
+                'verbose_name_plural': 'Обратный индекс ингредиентов',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeIngredientSet',
+            fields=[
+                ('recipe_id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Рецепт')),
+                ('ingredient_ids', models.BinaryField(verbose_name='Ингредиенты')),
+                ('size', models.PositiveIntegerField(verbose_name='Количество ингредиентов')),
+            ],
+            options={
+                'verbose_name': 'Набор ингредиентов рецепта',
+                'verbose_name_plural': 'Наборы ингредиентов рецептов',
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_recipe_scores(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeScore = apps.get_model('recipes', 'RecipeScore')
+    recipes = Recipe.objects.annotate(
+        favorites=models.Count('favorited_by', distinct=True),
+        carts=models.Count('in_shopping_carts', distinct=True),
+    ).values_list('id', 'favorites', 'carts')
+    RecipeScore.objects.bulk_create(
+        (
+            RecipeScore(recipe_id=recipe_id, popularity=favorites + carts)
+            for recipe_id, favorites, carts in recipes.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_ingredient_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('favorite', 'Избранное'), ('shopping_cart', 'Корзина')], max_length=16, verbose_name='Тип')),
+                ('delta', models.SmallIntegerField(verbose_name='Изменение')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата события')),
+            ],
+            options={
+                'verbose_name': 'Событие рецепта',
+                'verbose_name_plural': 'События рецептов',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('popularity', models.IntegerField(default=0, verbose_name='Популярность')),
+                ('trending', models.FloatField(default=0, verbose_name='Трендовость')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-popularity', '-recipe'], name='recipe_score_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-trending', '-recipe'], name='recipe_score_trending_idx'),
+        ),
+        migrations.AddField(
+            model_name='recipeactivity',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activities', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.RunPython(
+            create_recipe_scores, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:40
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def count_references(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    MediaFile = apps.get_model('recipes', 'MediaFile')
+    references = Counter(
+        Recipe.objects.exclude(image='').values_list('image', flat=True)
+    )
+    references.update(
+        User.objects.exclude(avatar='').exclude(avatar=None).values_list(
+            'avatar', flat=True
+        )
+    )
+    MediaFile.objects.bulk_create(
+        (
+            MediaFile(name=name, references=count)
+            for name, count in references.items()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0016_documentjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Имя файла')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Число ссылок')),
+            ],
+            options={
+                'verbose_name': 'Медиафайл',
+                'verbose_name_plural': 'Медиафайлы',
+            },
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_mediafile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeDeletion',
+            fields=[
+                ('recipe_id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Рецепт')),
+                ('deleted_at', models.DateTimeField(verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удалённый рецепт',
+                'verbose_name_plural': 'Удалённые рецепты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['updated_at', 'id'], name='recipe_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipedeletion',
+            index=models.Index(fields=['deleted_at', 'recipe_id'], name='recipe_deletion_idx'),
+        ),
+    ]
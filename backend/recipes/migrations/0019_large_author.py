@@ -0,0 +1,46 @@
+# Generated by Django 3.2.15 on 2026-10-19 11:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+FEED_FANOUT_LIMIT = 1000
+
+
+def mark_large_authors(apps, schema_editor):
+    Subscription = apps.get_model('recipes', 'Subscription')
+    LargeAuthor = apps.get_model('recipes', 'LargeAuthor')
+    LargeAuthor.objects.bulk_create(
+        (
+            LargeAuthor(author_id=author_id)
+            for author_id in Subscription.objects.values('author').annotate(
+                followers=Count('id')
+            ).filter(
+                followers__gt=FEED_FANOUT_LIMIT
+            ).values_list('author', flat=True)
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0018_recipe_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LargeAuthor',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+            ],
+            options={
+                'verbose_name': 'Крупный автор',
+                'verbose_name_plural': 'Крупные авторы',
+            },
+        ),
+        migrations.RunPython(mark_large_authors, migrations.RunPython.noop),
+    ]
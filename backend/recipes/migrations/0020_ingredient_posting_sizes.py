@@ -0,0 +1,54 @@
+# Generated by Django 3.2.15 on 2026-10-19 11:06
+
+import sys
+from array import array
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def pack_values(values):
+    packed = array('I', values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_ids(data):
+    unpacked = array('I')
+    unpacked.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        unpacked.byteswap()
+    return unpacked
+
+
+def fill_recipe_sizes(apps, schema_editor):
+    RecipeIngredientSet = apps.get_model('recipes', 'RecipeIngredientSet')
+    IngredientPosting = apps.get_model('recipes', 'IngredientPosting')
+    sizes = dict(RecipeIngredientSet.objects.values_list('recipe_id', 'size'))
+    postings = list(IngredientPosting.objects.all())
+    for posting in postings:
+        posting.recipe_sizes = pack_values(
+            sizes.get(recipe_id, 1)
+            for recipe_id in unpack_ids(posting.recipe_ids)
+        )
+    IngredientPosting.objects.bulk_update(
+        postings, ['recipe_sizes'], batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0019_large_author'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredientposting',
+            name='recipe_sizes',
+            field=models.BinaryField(default=b'', verbose_name='Количества ингредиентов рецептов'),
+        ),
+        migrations.RunPython(fill_recipe_sizes, migrations.RunPython.noop),
+    ]
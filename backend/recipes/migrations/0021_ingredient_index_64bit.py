@@ -0,0 +1,69 @@
+import sys
+from array import array
+from collections import defaultdict
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def pack_values(values):
+    packed = array('Q', values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def rebuild_index(apps, schema_editor):
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    RecipeIngredientSet = apps.get_model('recipes', 'RecipeIngredientSet')
+    IngredientPosting = apps.get_model('recipes', 'IngredientPosting')
+    recipe_sets = defaultdict(set)
+    postings = defaultdict(set)
+    rows = RecipeIngredient.objects.values_list(
+        'recipe_id', 'ingredient_id'
+    ).order_by().iterator(chunk_size=BATCH_SIZE)
+    for recipe_id, ingredient_id in rows:
+        recipe_sets[recipe_id].add(ingredient_id)
+        postings[ingredient_id].add(recipe_id)
+
+    RecipeIngredientSet.objects.all().delete()
+    IngredientPosting.objects.all().delete()
+    RecipeIngredientSet.objects.bulk_create(
+        (
+            RecipeIngredientSet(
+                recipe_id=recipe_id,
+                ingredient_ids=pack_values(sorted(ingredient_ids)),
+                size=len(ingredient_ids)
+            )
+            for recipe_id, ingredient_ids in recipe_sets.items()
+        ),
+        batch_size=BATCH_SIZE
+    )
+    IngredientPosting.objects.bulk_create(
+        (
+            IngredientPosting(
+                ingredient_id=ingredient_id,
+                recipe_ids=pack_values(recipe_ids),
+                recipe_sizes=pack_values(
+                    len(recipe_sets[recipe_id]) for recipe_id in recipe_ids
+                )
+            )
+            for ingredient_id, recipe_ids in (
+                (ingredient_id, sorted(recipe_ids))
+                for ingredient_id, recipe_ids in postings.items()
+            )
+        ),
+        batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0020_ingredient_posting_sizes'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_index, migrations.RunPython.noop),
+    ]
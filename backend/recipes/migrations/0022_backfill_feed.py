@@ -0,0 +1,48 @@
+from django.db import migrations
+
+FEED_BACKFILL_SIZE = 50
+BATCH_SIZE = 500
+
+
+def backfill_feeds(apps, schema_editor):
+    Subscription = apps.get_model('recipes', 'Subscription')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    LargeAuthor = apps.get_model('recipes', 'LargeAuthor')
+    author_ids = Subscription.objects.exclude(
+        author__in=LargeAuthor.objects.values('author')
+    ).values_list('author_id', flat=True).distinct().order_by('author_id')
+    for author_id in list(author_ids):
+        recipes = list(Recipe.objects.filter(author_id=author_id).values_list(
+            'id', 'created_at'
+        ).order_by('-created_at')[:FEED_BACKFILL_SIZE])
+        if not recipes:
+            continue
+        followers = Subscription.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+        FeedEntry.objects.bulk_create(
+            (
+                FeedEntry(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    created_at=created_at,
+                )
+                for user_id in followers.iterator()
+                for recipe_id, created_at in recipes
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0021_ingredient_index_64bit'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_feeds, migrations.RunPython.noop),
+    ]
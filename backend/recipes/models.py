@@ -1,10 +1,13 @@
+import uuid
+
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.forms import ValidationError
 
-from foodgram.constants import (MAX_INGREDIENT_M_U, MAX_INGREDIENT_NAME,
-                                MAX_RECIPE_NAME, MAX_TAG_FIELD,
+from foodgram.constants import (MAX_ACTIVITY_KIND, MAX_FILE_NAME,
+                                MAX_INGREDIENT_M_U, MAX_INGREDIENT_NAME,
+                                MAX_JOB_STATUS, MAX_RECIPE_NAME, MAX_TAG_FIELD,
                                 MIN_VALIDATOR_VALUE)
 
 from .validators import validate_custom_string
@@ -86,9 +89,20 @@ class Recipe(models.Model):
         related_name='recipes'
     )
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
 
     class Meta:
         ordering = ('-created_at', )
+        indexes = [
+            models.Index(
+                fields=('author', '-created_at'),
+                name='recipe_author_created_idx'
+            ),
+            models.Index(
+                fields=('updated_at', 'id'),
+                name='recipe_updated_idx'
+            ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -188,6 +202,39 @@ class ShoppingCart(models.Model):
         return f"{self.user.username} -> {self.recipe.name}"
 
 
+class ShoppingListItem(models.Model):
+    """
+    Модель итогового количества ингредиента в списке покупок пользователя.
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='shopping_list'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    amount = models.PositiveIntegerField('Количество', default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Список покупок'
+
+    def __str__(self):
+        return f"{self.user.username}: {self.ingredient.name} {self.amount}"
+
+
 class Subscription(models.Model):
     """
     Модель для подписок.
@@ -227,3 +274,275 @@ class Subscription(models.Model):
         super().clean()
         if self.user == self.author:
             raise ValidationError('Нельзя подписаться на самого себя')
+
+
+class FeedEntry(models.Model):
+    """
+    Модель записи ленты рецептов от авторов из подписок.
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    created_at = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-created_at', '-recipe')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-created_at', '-recipe'),
+                name='feed_entry_user_created_idx'
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+
+    def __str__(self):
+        return f"{self.user.username} <- {self.recipe.name}"
+
+
+class LargeAuthor(models.Model):
+    """
+    Модель отметки автора, у которого слишком много подписчиков
+    для рассылки рецептов по лентам: его рецепты читаются напрямую.
+    """
+
+    author = models.OneToOneField(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+'
+    )
+
+    class Meta:
+        verbose_name = 'Крупный автор'
+        verbose_name_plural = 'Крупные авторы'
+
+    def __str__(self):
+        return str(self.author_id)
+
+
+class RecipeIngredientSet(models.Model):
+    """
+    Модель набора ингредиентов рецепта в виде
+    отсортированного массива идентификаторов.
+    """
+
+    recipe_id = models.BigIntegerField('Рецепт', primary_key=True)
+    ingredient_ids = models.BinaryField('Ингредиенты')
+    size = models.PositiveIntegerField('Количество ингредиентов')
+
+    class Meta:
+        verbose_name = 'Набор ингредиентов рецепта'
+        verbose_name_plural = 'Наборы ингредиентов рецептов'
+
+    def __str__(self):
+        return f"Рецепт {self.recipe_id}: {self.size}"
+
+
+class RecipeDeletion(models.Model):
+    """
+    Модель журнала удалённых рецептов для синхронизации клиентов.
+    """
+
+    recipe_id = models.BigIntegerField('Рецепт', primary_key=True)
+    deleted_at = models.DateTimeField('Дата удаления')
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('deleted_at', 'recipe_id'),
+                name='recipe_deletion_idx'
+            ),
+        ]
+        verbose_name = 'Удалённый рецепт'
+        verbose_name_plural = 'Удалённые рецепты'
+
+    def __str__(self):
+        return f"Рецепт {self.recipe_id}: {self.deleted_at}"
+
+
+class IngredientPosting(models.Model):
+    """
+    Модель обратного индекса: рецепты, содержащие ингредиент,
+    в виде отсортированного массива идентификаторов и параллельного
+    массива количеств ингредиентов этих рецептов.
+    """
+
+    ingredient = models.OneToOneField(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='posting'
+    )
+    recipe_ids = models.BinaryField('Рецепты')
+    recipe_sizes = models.BinaryField(
+        'Количества ингредиентов рецептов', default=b''
+    )
+
+    class Meta:
+        verbose_name = 'Список рецептов ингредиента'
+        verbose_name_plural = 'Обратный индекс ингредиентов'
+
+    def __str__(self):
+        return str(self.ingredient)
+
+
+class RecipeActivity(models.Model):
+    """
+    Модель события добавления рецепта в избранное или корзину,
+    ещё не учтённого в рейтинге.
+    """
+
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    KIND_CHOICES = (
+        (FAVORITE, 'Избранное'),
+        (SHOPPING_CART, 'Корзина'),
+    )
+
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='activities'
+    )
+    kind = models.CharField(
+        'Тип', max_length=MAX_ACTIVITY_KIND, choices=KIND_CHOICES
+    )
+    delta = models.SmallIntegerField('Изменение')
+    created_at = models.DateTimeField('Дата события', auto_now_add=True)
+
+    class Meta:
+        ordering = ('id', )
+        verbose_name = 'Событие рецепта'
+        verbose_name_plural = 'События рецептов'
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.kind} {self.delta:+d}"
+
+
+class RecipeScore(models.Model):
+    """
+    Модель рейтинга рецепта: популярность и трендовость.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score'
+    )
+    popularity = models.IntegerField('Популярность', default=0)
+    trending = models.FloatField('Трендовость', default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('-popularity', '-recipe'),
+                name='recipe_score_popularity_idx'
+            ),
+            models.Index(
+                fields=('-trending', '-recipe'),
+                name='recipe_score_trending_idx'
+            ),
+        ]
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.popularity}"
+
+
+class DocumentJob(models.Model):
+    """
+    Модель задачи фоновой генерации документа.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='document_jobs'
+    )
+    status = models.CharField(
+        'Статус', max_length=MAX_JOB_STATUS,
+        choices=STATUS_CHOICES, default=PENDING
+    )
+    file_name = models.CharField(
+        'Имя файла', max_length=MAX_FILE_NAME, blank=True
+    )
+    error = models.TextField('Ошибка', blank=True)
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    started_at = models.DateTimeField('Дата запуска', null=True, blank=True)
+    finished_at = models.DateTimeField(
+        'Дата завершения', null=True, blank=True
+    )
+
+    class Meta:
+        ordering = ('-created_at', )
+        indexes = [
+            models.Index(
+                fields=('status', 'created_at'),
+                name='document_job_status_idx'
+            ),
+        ]
+        verbose_name = 'Задача генерации документа'
+        verbose_name_plural = 'Задачи генерации документов'
+
+    def __str__(self):
+        return f"{self.user.username}: {self.get_status_display()}"
+
+
+class MediaFile(models.Model):
+    """
+    Модель числа ссылок на файл в хранилище медиа.
+    """
+
+    name = models.CharField(
+        'Имя файла', max_length=MAX_FILE_NAME, primary_key=True
+    )
+    references = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Медиафайл'
+        verbose_name_plural = 'Медиафайлы'
+
+    def __str__(self):
+        return f"{self.name}: {self.references}"
@@ -0,0 +1,74 @@
+from django.db import connection, transaction
+
+from .models import Favorite, RecipeActivity, ShoppingCart
+from .scores import record_activity
+from .shopping_list import add_recipe_to_list, remove_recipe_from_list
+from .signals import recipe_relation_changed
+
+RELATION_ACTIVITIES = {
+    Favorite: RecipeActivity.FAVORITE,
+    ShoppingCart: RecipeActivity.SHOPPING_CART,
+}
+
+
+def insert_relation(model, user, recipe):
+    """
+    Метод добавляет связь пользователя с рецептом одним запросом;
+    существующая связь не изменяется. Возвращает True, если связь создана.
+    """
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, recipe_id) VALUES (%s, %s) '
+            'ON CONFLICT DO NOTHING',
+            [user.pk, recipe.pk]
+        )
+        return cursor.rowcount == 1
+
+
+def delete_relation(model, user, recipe):
+    """
+    Метод удаляет связь пользователя с рецептом одним запросом.
+    Возвращает True, если связь существовала.
+    """
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE user_id = %s AND recipe_id = %s',
+            [user.pk, recipe.pk]
+        )
+        return cursor.rowcount == 1
+
+
+@transaction.atomic
+def add_relation(model, user, recipe):
+    """
+    Метод добавляет рецепт в избранное или корзину пользователя
+    и учитывает изменение, только если связь действительно создана.
+    """
+
+    if not insert_relation(model, user, recipe):
+        return False
+    if model is ShoppingCart:
+        add_recipe_to_list(user, recipe)
+    record_activity(recipe, RELATION_ACTIVITIES[model], 1)
+    recipe_relation_changed.send(sender=model, user=user, recipe=recipe)
+    return True
+
+
+@transaction.atomic
+def remove_relation(model, user, recipe):
+    """
+    Метод удаляет рецепт из избранного или корзины пользователя
+    и учитывает изменение, только если связь действительно удалена.
+    """
+
+    if not delete_relation(model, user, recipe):
+        return False
+    if model is ShoppingCart:
+        remove_recipe_from_list(user, recipe)
+    record_activity(recipe, RELATION_ACTIVITIES[model], -1)
+    recipe_relation_changed.send(sender=model, user=user, recipe=recipe)
+    return True
@@ -0,0 +1,91 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.db import transaction
+
+from foodgram.constants import RECIPE_SCORES_BATCH_SIZE, TRENDING_HALF_LIFE
+
+from .models import RecipeActivity, RecipeScore
+
+TRENDING_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+TRENDING_DECAY = math.log(2) / TRENDING_HALF_LIFE
+
+
+def log_add_exp(first, second):
+    """
+    Метод вычисляет log(exp(first) + exp(second)) без переполнения.
+    """
+
+    high, low = max(first, second), min(first, second)
+    return high + math.log1p(math.exp(low - high))
+
+
+def get_trending_weight(moment):
+    """
+    Метод возвращает логарифм веса события.
+
+    Вес растёт экспоненциально от фиксированной эпохи, поэтому
+    порядок накопленных сумм совпадает с порядком затухающих
+    рейтингов и старые значения не нужно пересчитывать.
+    """
+
+    return TRENDING_DECAY * (moment - TRENDING_EPOCH).total_seconds()
+
+
+def record_activity(recipe, kind, delta):
+    """
+    Метод сохраняет событие для последующего пересчёта рейтинга.
+    """
+
+    RecipeActivity.objects.create(recipe=recipe, kind=kind, delta=delta)
+
+
+def update_recipe_scores():
+    """
+    Метод учитывает накопленные события в рейтингах рецептов
+    пакетами и возвращает число обработанных событий.
+    """
+
+    processed = 0
+    while True:
+        with transaction.atomic():
+            events = list(
+                RecipeActivity.objects.select_for_update(
+                    skip_locked=True
+                ).order_by('id')[:RECIPE_SCORES_BATCH_SIZE]
+            )
+            if not events:
+                return processed
+            popularity = defaultdict(int)
+            trending = {}
+            for event in events:
+                popularity[event.recipe_id] += event.delta
+                if event.delta > 0:
+                    weight = get_trending_weight(event.created_at)
+                    trending[event.recipe_id] = log_add_exp(
+                        trending.get(event.recipe_id, -math.inf), weight
+                    )
+
+            scores = RecipeScore.objects.select_for_update().in_bulk(
+                list(popularity)
+            )
+            created = []
+            for recipe_id, delta in popularity.items():
+                score = scores.get(recipe_id)
+                if score is None:
+                    score = RecipeScore(recipe_id=recipe_id)
+                    created.append(score)
+                score.popularity += delta
+                if recipe_id in trending:
+                    score.trending = log_add_exp(
+                        score.trending, trending[recipe_id]
+                    )
+            RecipeScore.objects.bulk_create(created)
+            RecipeScore.objects.bulk_update(
+                list(scores.values()), ['popularity', 'trending']
+            )
+            RecipeActivity.objects.filter(
+                id__in=[event.id for event in events]
+            ).delete()
+            processed += len(events)
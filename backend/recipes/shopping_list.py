@@ -0,0 +1,102 @@
+from collections import Counter
+
+from django.db.models import F
+
+from foodgram.constants import SHOPPING_LIST_BATCH_SIZE
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+
+def get_recipe_amounts(recipe):
+    """
+    Метод возвращает количества ингредиентов рецепта.
+    """
+
+    return Counter(dict(
+        RecipeIngredient.objects.filter(recipe=recipe).values_list(
+            'ingredient_id', 'amount'
+        )
+    ))
+
+
+def apply_deltas(user_ids, deltas):
+    """
+    Метод изменяет итоговые количества ингредиентов в списках
+    покупок пользователей; user_ids может быть подзапросом.
+    """
+
+    for ingredient_id, delta in deltas.items():
+        if not delta:
+            continue
+        items = ShoppingListItem.objects.filter(
+            user_id__in=user_ids, ingredient_id=ingredient_id
+        )
+        if delta < 0:
+            items.filter(amount__lte=-delta).delete()
+        else:
+            users = (
+                user_ids.iterator() if hasattr(user_ids, 'iterator')
+                else user_ids
+            )
+            ShoppingListItem.objects.bulk_create(
+                (
+                    ShoppingListItem(
+                        user_id=user_id, ingredient_id=ingredient_id
+                    )
+                    for user_id in users
+                ),
+                batch_size=SHOPPING_LIST_BATCH_SIZE,
+                ignore_conflicts=True
+            )
+        items.update(amount=F('amount') + delta)
+
+
+def add_recipe_to_list(user, recipe):
+    """
+    Метод добавляет ингредиенты рецепта в список покупок пользователя.
+    """
+
+    apply_deltas([user.pk], get_recipe_amounts(recipe))
+
+
+def remove_recipe_from_list(user, recipe):
+    """
+    Метод вычитает ингредиенты рецепта из списка покупок пользователя.
+    """
+
+    amounts = get_recipe_amounts(recipe)
+    apply_deltas([user.pk], {
+        ingredient_id: -amount for ingredient_id, amount in amounts.items()
+    })
+
+
+def apply_recipe_change(recipe, previous):
+    """
+    Метод переносит изменение ингредиентов рецепта в списки
+    покупок всех пользователей, у которых рецепт в корзине.
+    """
+
+    deltas = get_recipe_amounts(recipe)
+    deltas.subtract(previous)
+    if any(deltas.values()):
+        apply_deltas(
+            ShoppingCart.objects.filter(recipe=recipe).values_list(
+                'user_id', flat=True
+            ),
+            deltas
+        )
+
+
+def remove_recipe_from_all_lists(recipe):
+    """
+    Метод вычитает ингредиенты удаляемого рецепта из всех
+    списков покупок, где он есть.
+    """
+
+    amounts = get_recipe_amounts(recipe)
+    apply_deltas(
+        ShoppingCart.objects.filter(recipe=recipe).values_list(
+            'user_id', flat=True
+        ),
+        {ingredient_id: -amount for ingredient_id, amount in amounts.items()}
+    )
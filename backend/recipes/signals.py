@@ -0,0 +1,180 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from foodgram.tasks import run_in_background
+
+from .catalog import refresh_catalog
+from .feed import (add_author_to_feed, fan_out_recipe, remove_author_from_feed,
+                   update_large_author)
+from .ingredient_index import index_recipe
+from .media import track_file_references
+from .models import (Ingredient, Recipe, RecipeDeletion, RecipeScore,
+                     Subscription, Tag)
+from .shopping_list import apply_recipe_change, remove_recipe_from_all_lists
+
+User = get_user_model()
+
+# Отправляется после сохранения набора ингредиентов рецепта: аргументы
+# recipe и previous (прежние количества по идентификаторам ингредиентов).
+recipe_ingredients_changed = Signal()
+
+# Отправляется после пакетной загрузки рецептов в обход сигналов
+# сохранения моделей: аргумент recipe_ids.
+recipes_imported = Signal()
+
+# Отправляется после добавления или удаления рецепта в избранном или
+# корзине запросом в обход сигналов моделей: аргументы user и recipe.
+recipe_relation_changed = Signal()
+
+track_file_references(Recipe, 'image')
+track_file_references(User, 'avatar')
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(sender, instance, created, **kwargs):
+    """
+    Обновление версии рецептов автора при изменении его профиля.
+    """
+
+    update_fields = kwargs.get('update_fields')
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    Recipe.objects.filter(author=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Tag)
+def touch_tag_recipes(sender, instance, created, **kwargs):
+    """
+    Обновление версии рецептов при изменении тега.
+    """
+
+    if not created:
+        Recipe.objects.filter(tags=instance).update(
+            updated_at=timezone.now()
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_ingredient_recipes(sender, instance, created, **kwargs):
+    """
+    Обновление версии рецептов при изменении ингредиента.
+    """
+
+    if not created:
+        Recipe.objects.filter(ingredients=instance).update(
+            updated_at=timezone.now()
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(recipes_imported, sender=Recipe)
+def update_ingredient_catalog(sender, **kwargs):
+    """
+    Пересборка снимка каталога ингредиентов после изменения таблицы.
+    """
+
+    run_in_background(refresh_catalog)
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_score(sender, instance, created, **kwargs):
+    """
+    Создание рейтинга для нового рецепта.
+    """
+
+    if created:
+        RecipeScore.objects.create(recipe=instance)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_new_recipe(sender, instance, created, **kwargs):
+    """
+    Рассылка нового рецепта по лентам подписчиков.
+    """
+
+    if created:
+        run_in_background(fan_out_recipe, instance.pk)
+
+
+@receiver(post_save, sender=Subscription)
+def fill_feed_on_subscribe(sender, instance, created, **kwargs):
+    """
+    Заполнение ленты рецептами автора при подписке.
+    """
+
+    if created:
+        run_in_background(
+            add_author_to_feed, instance.user_id, instance.author_id
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def clear_feed_on_unsubscribe(sender, instance, **kwargs):
+    """
+    Очистка ленты от рецептов автора при отписке.
+    """
+
+    run_in_background(
+        remove_author_from_feed, instance.user_id, instance.author_id
+    )
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def update_author_fanout(sender, instance, **kwargs):
+    """
+    Обновление отметки крупного автора после изменения подписок.
+    """
+
+    if kwargs.get('created', True):
+        run_in_background(update_large_author, instance.author_id)
+
+
+@receiver(recipe_ingredients_changed, sender=Recipe)
+def reindex_recipe_ingredients(sender, recipe, **kwargs):
+    """
+    Обновление обратного индекса ингредиентов после изменения рецепта.
+    """
+
+    run_in_background(index_recipe, recipe.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_deleted_recipe(sender, instance, **kwargs):
+    """
+    Удаление рецепта из обратного индекса ингредиентов.
+    """
+
+    run_in_background(index_recipe, instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def log_recipe_deletion(sender, instance, **kwargs):
+    """
+    Запись удаления рецепта в журнал для синхронизации клиентов.
+    """
+
+    RecipeDeletion.objects.update_or_create(
+        recipe_id=instance.pk, defaults={'deleted_at': timezone.now()}
+    )
+
+
+@receiver(recipe_ingredients_changed, sender=Recipe)
+def update_shopping_lists(sender, recipe, previous=None, **kwargs):
+    """
+    Перенос изменения ингредиентов рецепта в списки покупок.
+    """
+
+    apply_recipe_change(recipe, previous or {})
+
+
+@receiver(pre_delete, sender=Recipe)
+def clear_shopping_lists(sender, instance, **kwargs):
+    """
+    Вычитание ингредиентов удаляемого рецепта из списков покупок.
+    """
+
+    remove_recipe_from_all_lists(instance)
@@ -0,0 +1,281 @@
+import json
+import os
+import shutil
+import tarfile
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+
+from foodgram.constants import RECIPE_TRANSFER_BATCH_SIZE
+
+from .ingredient_index import index_new_recipes
+from .models import (Ingredient, MediaFile, Recipe, RecipeIngredient,
+                     RecipeScore, Tag)
+from .signals import recipes_imported
+
+User = get_user_model()
+
+
+def iter_batches(iterable, size):
+    """
+    Метод разбивает поток на списки заданного размера.
+    """
+
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export_recipes(output, media=None,
+                   batch_size=RECIPE_TRANSFER_BATCH_SIZE):
+    """
+    Метод выгружает рецепты в поток JSONL по одной записи на строку,
+    изображения при необходимости добавляются в tar-архив media.
+
+    Рецепты читаются серверным курсором, ингредиенты и теги
+    догружаются одним запросом на пачку. Возвращает число рецептов.
+    """
+
+    recipes = Recipe.objects.order_by('id').values(
+        'id', 'author__email', 'name', 'image', 'text', 'cooking_time'
+    ).iterator(chunk_size=batch_size)
+    exported = 0
+    for batch in iter_batches(recipes, batch_size):
+        recipe_ids = [recipe['id'] for recipe in batch]
+        ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+        for recipe_id, name, unit, amount in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('id').values_list(
+            'recipe_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'
+        ):
+            ingredients[recipe_id].append([name, unit, amount])
+        tags = {recipe_id: [] for recipe_id in recipe_ids}
+        for recipe_id, slug, name in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('id').values_list('recipe_id', 'tag__slug', 'tag__name'):
+            tags[recipe_id].append([slug, name])
+
+        for recipe in batch:
+            output.write(json.dumps({
+                'id': recipe['id'],
+                'author': recipe['author__email'],
+                'name': recipe['name'],
+                'image': recipe['image'],
+                'text': recipe['text'],
+                'cooking_time': recipe['cooking_time'],
+                'tags': tags[recipe['id']],
+                'ingredients': ingredients[recipe['id']],
+            }, ensure_ascii=False) + '\n')
+            if media is not None and default_storage.exists(recipe['image']):
+                media.add(
+                    default_storage.path(recipe['image']),
+                    arcname=recipe['image']
+                )
+        exported += len(batch)
+    return exported
+
+
+def extract_media(archive):
+    """
+    Метод распаковывает изображения из tar-архива в каталог медиа,
+    пропуская элементы с путями вне него.
+    """
+
+    root = os.path.realpath(settings.MEDIA_ROOT)
+    with tarfile.open(fileobj=archive, mode='r|*') as media:
+        for member in media:
+            path = os.path.realpath(os.path.join(root, member.name))
+            if not member.isfile() or not path.startswith(root + os.sep):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                shutil.copyfileobj(media.extractfile(member), file)
+
+
+def resolve_tags(records):
+    """
+    Метод возвращает теги пачки по слагу, недостающие создаются.
+
+    Тег с новым слагом, но уже существующим названием, сопоставляется
+    с имеющимся тегом. Если тег не удалось ни найти, ни создать,
+    ошибка выбрасывается до записи рецептов.
+    """
+
+    names = {
+        slug: name
+        for record in records for slug, name in record['tags']
+    }
+    tags = dict(Tag.objects.filter(slug__in=names).values_list('slug', 'id'))
+    by_name = dict(Tag.objects.filter(
+        name__in={name for slug, name in names.items() if slug not in tags}
+    ).order_by('-id').values_list('name', 'id'))
+    missing = {}
+    for slug, name in names.items():
+        if slug in tags:
+            continue
+        if name in by_name:
+            tags[slug] = by_name[name]
+        else:
+            missing[slug] = name
+    if missing:
+        Tag.objects.bulk_create(
+            [Tag(slug=slug, name=name) for slug, name in missing.items()],
+            ignore_conflicts=True
+        )
+        tags.update(
+            Tag.objects.filter(slug__in=missing).values_list('slug', 'id')
+        )
+    unresolved = set(names) - set(tags)
+    if unresolved:
+        raise ValueError(
+            f'Не удалось создать теги: {", ".join(sorted(unresolved))}.'
+        )
+    return tags
+
+
+def resolve_ingredients(records):
+    """
+    Метод возвращает ингредиенты пачки по естественному ключу
+    (название, единица измерения), недостающие создаются.
+
+    Созданные одновременно с загрузкой строки не прерывают её:
+    конфликты вставки пропускаются, а ингредиенты перечитываются.
+    """
+
+    keys = {
+        (name, unit)
+        for record in records for name, unit, _ in record['ingredients']
+    }
+
+    def load():
+        return {
+            (name, unit): ingredient_id
+            for ingredient_id, name, unit in Ingredient.objects.filter(
+                name__in={name for name, _ in keys}
+            ).order_by('-id').values_list('id', 'name', 'measurement_unit')
+            if (name, unit) in keys
+        }
+
+    ingredients = load()
+    missing = keys - set(ingredients)
+    if missing:
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in missing
+            ],
+            ignore_conflicts=True
+        )
+        ingredients = load()
+    return ingredients
+
+
+def acquire_images(names):
+    """
+    Метод увеличивает число ссылок на изображения пачки.
+    """
+
+    counts = Counter(name for name in names if name)
+    MediaFile.objects.bulk_create(
+        [MediaFile(name=name) for name in counts], ignore_conflicts=True
+    )
+    for name, count in counts.items():
+        MediaFile.objects.filter(name=name).update(
+            references=F('references') + count
+        )
+
+
+@transaction.atomic
+def import_batch(records, default_author=None):
+    """
+    Метод загружает пачку рецептов и возвращает соответствие
+    исходных идентификаторов новым; рецепты неизвестных
+    авторов без автора по умолчанию пропускаются.
+    """
+
+    authors = dict(User.objects.filter(
+        email__in={record['author'] for record in records}
+    ).values_list('email', 'id'))
+    default_author_id = default_author.pk if default_author else None
+    records = [
+        record for record in records
+        if authors.get(record['author'], default_author_id)
+    ]
+    tags = resolve_tags(records)
+    ingredients = resolve_ingredients(records)
+
+    recipes = [
+        Recipe(
+            author_id=authors.get(record['author'], default_author_id),
+            name=record['name'],
+            image=record['image'],
+            text=record['text'],
+            cooking_time=record['cooking_time'],
+        )
+        for record in records
+    ]
+    # Без возврата идентификаторов из пакетной вставки рецепты
+    # сохраняются по одному, ссылки на изображения и рейтинги
+    # при этом создают обработчики сигналов сохранения.
+    bulk = connection.features.can_return_rows_from_bulk_insert
+    if bulk:
+        Recipe.objects.bulk_create(recipes)
+    else:
+        for recipe in recipes:
+            recipe.save()
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.pk, tag_id=tags[slug])
+        for record, recipe in zip(records, recipes)
+        for slug, _ in record['tags']
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe_id=recipe.pk,
+            ingredient_id=ingredients[(name, unit)],
+            amount=amount
+        )
+        for record, recipe in zip(records, recipes)
+        for name, unit, amount in record['ingredients']
+    )
+    if bulk:
+        RecipeScore.objects.bulk_create(
+            RecipeScore(recipe_id=recipe.pk) for recipe in recipes
+        )
+        acquire_images(record['image'] for record in records)
+    index_new_recipes({
+        recipe.pk: [
+            ingredients[(name, unit)]
+            for name, unit, _ in record['ingredients']
+        ]
+        for record, recipe in zip(records, recipes)
+    })
+    return {
+        record['id']: recipe.pk for record, recipe in zip(records, recipes)
+    }
+
+
+def import_recipes(lines, default_author=None,
+                   batch_size=RECIPE_TRANSFER_BATCH_SIZE):
+    """
+    Метод загружает рецепты из потока JSONL пачками и возвращает
+    число загруженных и пропущенных записей.
+    """
+
+    imported = skipped = 0
+    records = (json.loads(line) for line in lines if line.strip())
+    for batch in iter_batches(records, batch_size):
+        id_map = import_batch(batch, default_author)
+        imported += len(id_map)
+        skipped += len(batch) - len(id_map)
+        recipes_imported.send(sender=Recipe, recipe_ids=list(id_map.values()))
+    return imported, skipped
@@ -6,6 +6,7 @@ from djoser.serializers import UserCreateSerializer as BaseUserCreateSerializer
 from djoser.serializers import UserSerializer as BaseUserSerializer
 from rest_framework import serializers
 
+from api.relation_sets import get_relation_sets
 from foodgram.constants import MAX_EMAIL_LENGTH, MAX_NAME_LENGTH
 from recipes.models import Recipe, Subscription
 
@@ -14,6 +15,53 @@ from .validators import username_validator
 User = get_user_model()
 
 
+def get_sparse_fieldset(request, available):
+    """
+    Метод возвращает набор полей по параметрам запроса fields и omit.
+    """
+
+    if request is None:
+        return tuple(available)
+    selected = tuple(available)
+    fields = request.query_params.get('fields')
+    if fields:
+        requested = {name.strip() for name in fields.split(',')}
+        selected = tuple(name for name in selected if name in requested)
+    omit = request.query_params.get('omit')
+    if omit:
+        omitted = {name.strip() for name in omit.split(',')}
+        selected = tuple(name for name in selected if name not in omitted)
+    return selected
+
+
+class SparseFieldsetMixin:
+    """
+    Миксин, ограничивающий поля корневого сериализатора
+    параметрами запроса fields и omit.
+    """
+
+    def is_root_serializer(self):
+        """
+        Метод проверяет, что сериализатор не вложен в другой.
+        """
+
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        """
+        Метод возвращает поля, выбранные в запросе.
+        """
+
+        fields = super().get_fields()
+        if not self.is_root_serializer():
+            return fields
+        selected = get_sparse_fieldset(self.context.get('request'), fields)
+        return {name: fields[name] for name in selected}
+
+
 class Base64ImageField(serializers.ImageField):
     """
     Класс для сериализации изображений в формате base64.
@@ -95,7 +143,7 @@ class UserCreateSerializer(BaseUserCreateSerializer):
         return value
 
 
-class UserSerializer(BaseUserSerializer):
+class UserSerializer(SparseFieldsetMixin, BaseUserSerializer):
     """
     Сериализатор для работы с пользователями.
     """
@@ -120,12 +168,12 @@ class UserSerializer(BaseUserSerializer):
         Метод для получаения информации о подписке пользователя на автора.
         """
 
-        request = self.context.get('request')
-        return (
-            request.user.is_authenticated
-            and Subscription.objects.filter(
-                user=request.user, author=obj
-            ).exists())
+        subscribed_author_ids = self.context.get('subscribed_author_ids')
+        if subscribed_author_ids is None:
+            subscribed_author_ids = get_relation_sets(
+                self.context.get('request')
+            ).subscribed_author_ids
+        return obj.pk in subscribed_author_ids
 
 
 class AvatarUpdateDeleteSerializer(serializers.ModelSerializer):
@@ -161,7 +209,9 @@ class RecipeMinifiedSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
-class SubscriptionSerializers(serializers.ModelSerializer):
+class SubscriptionSerializers(
+    SparseFieldsetMixin, serializers.ModelSerializer
+):
     """
     Сериализатор для подписок.
     """
@@ -246,10 +296,9 @@ class SubscriptionSerializers(serializers.ModelSerializer):
         Метод для получения информации о подписке.
         """
 
-        request = self.context.get('request')
-        return Subscription.objects.filter(
-            user=request.user, author=obj.author
-        ).exists()
+        return obj.author_id in get_relation_sets(
+            self.context.get('request')
+        ).subscribed_author_ids
 
     def get_recipes(self, obj):
         """
@@ -258,7 +307,7 @@ class SubscriptionSerializers(serializers.ModelSerializer):
 
         request = self.context.get('request')
         recipes_limit = request.query_params.get('recipes_limit')
-        recipes = Recipe.objects.filter(author=obj.author)
+        recipes = obj.author.recipes.all()
         if recipes_limit:
             recipes = recipes[:int(recipes_limit)]
         return RecipeMinifiedSerializer(recipes, many=True).data
@@ -268,4 +317,6 @@ class SubscriptionSerializers(serializers.ModelSerializer):
         Метод для получение количества рецептов автора.
         """
 
-        return Recipe.objects.filter(author=obj.author).count()
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        return obj.author.recipes.count()
@@ -1,7 +1,12 @@
 from django.urls import include, path
+from rest_framework.routers import DefaultRouter
 
 from .views import (CurrentUserViewSet, SubscriptionsViewSet,
-                    UpdateDeleteAvatarViewSet)
+                    UpdateDeleteAvatarViewSet, UserViewSet)
+
+router_v1 = DefaultRouter()
+
+router_v1.register('users', UserViewSet, basename='user')
 
 urlpatterns = [
     path(
@@ -26,6 +31,6 @@ urlpatterns = [
         SubscriptionsViewSet.as_view({'post': 'create', 'delete': 'destroy'}),
         name='subscribe-user'
     ),
-    path('', include('djoser.urls')),
+    path('', include(router_v1.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
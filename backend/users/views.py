@@ -1,17 +1,63 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Count, Prefetch
 from django.shortcuts import get_object_or_404
+from djoser.views import UserViewSet as BaseUserViewSet
 from rest_framework import mixins, status, viewsets
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from recipes.models import Subscription
+from api.pagination import KeysetPagination
+from recipes.models import Recipe, Subscription
 
 from .serializers import (AvatarUpdateDeleteSerializer,
-                          SubscriptionSerializers, UserSerializer)
+                          SubscriptionSerializers, UserSerializer,
+                          get_sparse_fieldset)
 
 User = get_user_model()
 
+USER_COLUMN_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'avatar',
+)
+USER_KEYSET_ORDERING = ('username', 'id', )
+
+
+class UserViewSet(BaseUserViewSet):
+    """
+    Класс представления пользователей djoser, загружающий из базы
+    только столбцы, выбранные параметрами fields и omit.
+    """
+
+    def get_queryset(self):
+        """
+        Метод возвращает набор пользователей с отложенными
+        невыбранными столбцами.
+        """
+
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        fields = get_sparse_fieldset(self.request, USER_COLUMN_FIELDS)
+        return queryset.only('id', *fields)
+
+    @property
+    def paginator(self):
+        """
+        Пагинатор списка; при наличии параметра cursor
+        используется пагинация по ключу без подсчёта всех строк.
+        """
+
+        if not hasattr(self, '_paginator'):
+            if (
+                self.action != 'list'
+                or KeysetPagination.cursor_query_param
+                not in self.request.query_params
+            ):
+                return super().paginator
+            self._paginator = KeysetPagination()
+            self._paginator.ordering = USER_KEYSET_ORDERING
+        return self._paginator
+
 
 class CurrentUserViewSet(viewsets.ModelViewSet):
     """
@@ -57,7 +103,8 @@ class UpdateDeleteAvatarViewSet(
 
         user = self.get_object()
         if user.avatar:
-            user.avatar.delete(save=True)
+            user.avatar = None
+            user.save(update_fields=['avatar'])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -75,6 +122,20 @@ class SubscriptionsViewSet(
     permission_classes = [IsAuthenticated]
     serializer_class = SubscriptionSerializers
 
+    def get_queryset(self):
+        """
+        Метод возвращает подписки текущего пользователя с авторами,
+        числом их рецептов и самими рецептами, загруженными пакетно.
+        """
+
+        return self.queryset.filter(user=self.request.user).select_related(
+            'author'
+        ).annotate(recipes_count=Count('author__recipes')).prefetch_related(
+            Prefetch('author__recipes', queryset=Recipe.objects.only(
+                'id', 'author_id', 'name', 'image', 'cooking_time'
+            ))
+        ).order_by('id')
+
     def create(self, request, *args, **kwargs):
         """
         Метод создания новой подписки на автора.
@@ -0,0 +1,400 @@
+"""
+Нагрузочное воспроизведение запросов postman-коллекции.
+
+Запросы коллекции превращаются во взвешенные сценарии и выполняются
+параллельно из нескольких потоков против запущенного сервера. По итогам
+выводятся пропускная способность, перцентили задержки по каждому
+запросу и доля ошибок.
+
+Пример:
+    python load_test.py --token <токен> --concurrency 8 --duration 60 \\
+        --weight 'get_recipes_list*=5' --weight 'download_*=0.5'
+"""
+
+import argparse
+import fnmatch
+import http.client
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import quote, urlsplit
+
+COLLECTION = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'foodgram.postman_collection.json'
+)
+VARIABLE = re.compile(r'{{(\w+)}}')
+PERCENTILES = (50, 90, 99)
+
+# Переменные, которые коллекция заполняет в ходе своих тестов:
+# путь запроса для их определения и извлечение значения из ответа.
+DISCOVERY = {
+    'userId': ('/api/users/me/', lambda data: data['id']),
+    'firstRecipeId': ('/api/recipes/', lambda data: data['results'][0]['id']),
+    'firstTagId': ('/api/tags/', lambda data: data[0]['id']),
+    'secondTagSlug': ('/api/tags/', lambda data: data[1]['slug']),
+    'thirdTagSlug': ('/api/tags/', lambda data: data[2]['slug']),
+    'firstIndredientId': ('/api/ingredients/', lambda data: data[0]['id']),
+    'ingredientNameFirstLatter': (
+        '/api/ingredients/', lambda data: data[0]['name'][0]
+    ),
+}
+
+
+class UnresolvedVariable(KeyError):
+    """
+    Переменная коллекции не задана и не определена автоматически.
+    """
+
+
+def substitute(template, variables):
+    """
+    Метод подставляет значения переменных в шаблон коллекции.
+    """
+
+    def replace(match):
+        if match.group(1) not in variables:
+            raise UnresolvedVariable(match.group(1))
+        return str(variables[match.group(1)])
+
+    return VARIABLE.sub(replace, template)
+
+
+def iter_requests(items, auth=None):
+    """
+    Метод обходит папки коллекции и возвращает запросы
+    с учётом авторизации, унаследованной от папок.
+    """
+
+    for item in items:
+        item_auth = item.get('auth', auth)
+        if 'item' in item:
+            yield from iter_requests(item['item'], item_auth)
+        else:
+            yield item['name'], item['request'], (
+                item['request'].get('auth', item_auth)
+            )
+
+
+def build_scenario(name, request, auth, variables):
+    """
+    Метод превращает запрос коллекции в сценарий: метод, путь,
+    заголовки и тело с подставленными переменными.
+    """
+
+    url = request['url']
+    url = urlsplit(substitute(
+        url['raw'] if isinstance(url, dict) else url, variables
+    ))
+    path = quote(url.path or '/', safe='/%') + (
+        f'?{quote(url.query, safe="=&%")}' if url.query else ''
+    )
+    headers = {
+        header['key']: substitute(header['value'], variables)
+        for header in request.get('header', [])
+        if not header.get('disabled')
+    }
+    if auth and auth.get('type') == 'apikey':
+        options = {option['key']: option['value'] for option in auth['apikey']}
+        headers[options.get('key', 'Authorization')] = substitute(
+            options['value'], variables
+        )
+    body = request.get('body', {}).get('raw')
+    if body is not None:
+        body = substitute(body, variables).encode()
+        headers.setdefault('Content-Type', 'application/json')
+    return {
+        'name': name,
+        'method': request['method'],
+        'path': path,
+        'headers': headers,
+        'body': body,
+    }
+
+
+def load_scenarios(collection, variables, methods, weights, only):
+    """
+    Метод возвращает сценарии коллекции с весами; запросы
+    с неизвестными переменными пропускаются с предупреждением.
+    """
+
+    scenarios = []
+    for name, request, auth in iter_requests(
+        collection['item'], collection.get('auth')
+    ):
+        if request['method'] not in methods:
+            continue
+        if only and not any(
+            fnmatch.fnmatch(name, pattern) for pattern in only
+        ):
+            continue
+        weight = 1.0
+        for pattern, value in weights:
+            if fnmatch.fnmatch(name, pattern):
+                weight = value
+        if weight <= 0:
+            continue
+        try:
+            scenario = build_scenario(name, request, auth, variables)
+        except UnresolvedVariable as error:
+            print(f'Пропущен {name}: не задана переменная {error}',
+                  file=sys.stderr)
+            continue
+        scenario['weight'] = weight
+        scenarios.append(scenario)
+    return scenarios
+
+
+def open_connection(base_url, timeout):
+    """
+    Метод открывает соединение с сервером по базовому адресу.
+    """
+
+    url = urlsplit(base_url)
+    connection_class = (
+        http.client.HTTPSConnection if url.scheme == 'https'
+        else http.client.HTTPConnection
+    )
+    return connection_class(url.netloc, timeout=timeout)
+
+
+def fetch_json(base_url, path, token, timeout):
+    """
+    Метод выполняет GET-запрос и возвращает разобранный JSON.
+    """
+
+    connection = open_connection(base_url, timeout)
+    headers = {'Authorization': f'Token {token}'} if token else {}
+    try:
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        return json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def discover_variables(base_url, token, variables, timeout):
+    """
+    Метод определяет по API идентификаторы объектов, которые
+    коллекция запоминает в переменных при обычном прогоне.
+    """
+
+    responses = {}
+    for name, (path, extract) in DISCOVERY.items():
+        if name in variables:
+            continue
+        try:
+            if path not in responses:
+                responses[path] = fetch_json(base_url, path, token, timeout)
+            variables[name] = extract(responses[path])
+        except (OSError, ValueError, LookupError, TypeError):
+            continue
+
+
+def run_worker(base_url, scenarios, deadline, results, lock, timeout, seed):
+    """
+    Метод выполняет случайные взвешенные сценарии до наступления
+    deadline через одно постоянное соединение потока.
+    """
+
+    chooser = random.Random(seed)
+    weights = [scenario['weight'] for scenario in scenarios]
+    connection = open_connection(base_url, timeout)
+    local = defaultdict(new_stats)
+    while time.monotonic() < deadline:
+        scenario = chooser.choices(scenarios, weights)[0]
+        stats = local[scenario['name']]
+        started = time.perf_counter()
+        try:
+            connection.request(
+                scenario['method'], scenario['path'],
+                body=scenario['body'], headers=scenario['headers']
+            )
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            stats['failures'] += 1
+            connection.close()
+            connection = open_connection(base_url, timeout)
+            continue
+        stats['latencies'].append(time.perf_counter() - started)
+        stats['statuses'][response.status] += 1
+    connection.close()
+    with lock:
+        for name, stats in local.items():
+            merge_stats(results[name], stats)
+
+
+def new_stats():
+    """
+    Метод возвращает пустую статистику запроса: задержки ответов,
+    число ответов по статусам и число сбоев соединения.
+    """
+
+    return {'latencies': [], 'statuses': defaultdict(int), 'failures': 0}
+
+
+def merge_stats(total, stats):
+    """
+    Метод добавляет статистику к накопленной.
+    """
+
+    total['latencies'].extend(stats['latencies'])
+    total['failures'] += stats['failures']
+    for status, count in stats['statuses'].items():
+        total['statuses'][status] += count
+
+
+def percentile(values, rank):
+    """
+    Метод возвращает перцентиль отсортированного списка.
+    """
+
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(rank / 100 * len(values)) - 1))
+    return values[index]
+
+
+def print_report(results, elapsed):
+    """
+    Метод выводит пропускную способность, перцентили задержки
+    в миллисекундах и долю ошибок (сбои соединения и ответы 5xx)
+    по каждому запросу и в целом.
+    """
+
+    columns = ['запросов', 'rps'] + [f'p{rank}' for rank in PERCENTILES]
+    columns += ['max', 'ошибок %', 'статусы']
+    width = max([len(name) for name in results] + [len('ИТОГО')])
+    print(f'{"запрос":<{width}}  ' + '  '.join(
+        f'{column:>9}' for column in columns[:-1]
+    ) + f'  {columns[-1]}')
+
+    def row(name, stats):
+        latencies = sorted(stats['latencies'])
+        statuses = stats['statuses']
+        attempts = len(latencies) + stats['failures']
+        errors = stats['failures'] + sum(
+            count for status, count in statuses.items() if status >= 500
+        )
+        cells = [f'{attempts:>9}', f'{attempts / elapsed:>9.1f}']
+        cells += [
+            f'{percentile(latencies, rank) * 1000:>9.1f}'
+            for rank in PERCENTILES
+        ]
+        cells.append(f'{(latencies[-1] if latencies else 0) * 1000:>9.1f}')
+        cells.append(f'{100 * errors / max(attempts, 1):>9.2f}')
+        cells.append(' '.join(
+            f'{status}:{count}' for status, count in sorted(statuses.items())
+        ))
+        print(f'{name:<{width}}  ' + '  '.join(cells))
+
+    totals = new_stats()
+    for name in sorted(results):
+        row(name, results[name])
+        merge_stats(totals, results[name])
+    row('ИТОГО', totals)
+
+
+def parse_pair(value, convert=str):
+    """
+    Метод разбирает аргумент вида имя=значение.
+    """
+
+    name, separator, item = value.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError(f'Ожидается имя=значение: {value}')
+    return name, convert(item)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--collection', default=COLLECTION)
+    parser.add_argument(
+        '--base-url', help='Адрес сервера вместо baseUrl из коллекции'
+    )
+    parser.add_argument(
+        '--token', help='Токен пользователя для запросов с авторизацией'
+    )
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument(
+        '--duration', type=float, default=30, help='Длительность, секунд'
+    )
+    parser.add_argument(
+        '--warmup', type=float, default=0,
+        help='Прогрев без учёта в отчёте, секунд'
+    )
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument(
+        '--method', action='append', dest='methods',
+        help='Воспроизводимые методы; по умолчанию только GET'
+    )
+    parser.add_argument(
+        '--weight', action='append', default=[],
+        type=lambda value: parse_pair(value, float),
+        help='Вес сценариев по шаблону имени: шаблон=вес'
+    )
+    parser.add_argument(
+        '--only', action='append', default=[],
+        help='Оставить только сценарии по шаблону имени'
+    )
+    parser.add_argument(
+        '--var', action='append', default=[], type=parse_pair,
+        help='Значение переменной коллекции: имя=значение'
+    )
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.collection, encoding='utf-8') as file:
+        collection = json.load(file)
+    variables = {
+        variable['key']: variable['value']
+        for variable in collection.get('variable', [])
+    }
+    if args.base_url:
+        variables['baseUrl'] = args.base_url.rstrip('/')
+    if args.token:
+        variables['userToken'] = args.token
+    variables.update(args.var)
+    base_url = variables['baseUrl']
+    discover_variables(base_url, args.token, variables, args.timeout)
+
+    scenarios = load_scenarios(
+        collection, variables, set(args.methods or ['GET']),
+        args.weight, args.only
+    )
+    if not scenarios:
+        parser.error('Нет сценариев для воспроизведения.')
+    print(f'Сценариев: {len(scenarios)}, потоков: {args.concurrency}, '
+          f'длительность: {args.duration} с.', file=sys.stderr)
+
+    seeds = random.Random(args.seed)
+    for duration, report in ((args.warmup, False), (args.duration, True)):
+        if duration <= 0:
+            continue
+        results = defaultdict(new_stats)
+        lock = threading.Lock()
+        started = time.monotonic()
+        deadline = started + duration
+        threads = [
+            threading.Thread(target=run_worker, args=(
+                base_url, scenarios, deadline, results, lock,
+                args.timeout, seeds.random()
+            ))
+            for _ in range(args.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if report:
+            print_report(results, time.monotonic() - started)
+
+
+if __name__ == '__main__':
+    main()